@@ -1,34 +1,109 @@
 # -*- coding: utf-8 -*-
 # Author: XuMing <xuming624@qq.com>
 # Brief: pycorrector.api
+# 导入时只加载配置，默认纠错器和依赖kenlm、numpy、pypinyin的模块在首次使用时才加载
+import importlib
+import sys
+import threading
+import types
 
 from .config import common_char_path, same_pinyin_path, same_stroke_path, language_model_path, word_freq_path, \
-    custom_confusion_path, custom_word_freq_path, place_name_path, person_name_path, stopwords_path
-from .corrector import Corrector
-from .utils.text_utils import get_homophones_by_char, get_homophones_by_pinyin
-from .utils.text_utils import traditional2simplified, simplified2traditional
+    custom_confusion_path, custom_word_freq_path, place_name_path, person_name_path, stopwords_path, \
+    resource_bundle_path, language_model_load_method
+from .utils.budget import CorrectionBudget
 
 __version__ = '0.1.6'
 
-corrector = Corrector(common_char_path=common_char_path,
-                      same_pinyin_path=same_pinyin_path,
-                      same_stroke_path=same_stroke_path,
-                      language_model_path=language_model_path,
-                      word_freq_path=word_freq_path,
-                      custom_word_freq_path=custom_word_freq_path,
-                      custom_confusion_path=custom_confusion_path,
-                      person_name_path=person_name_path,
-                      place_name_path=place_name_path,
-                      stopwords_path=stopwords_path)
-get_same_pinyin = corrector.get_same_pinyin
-get_same_stroke = corrector.get_same_stroke
-set_custom_confusion_dict = corrector.set_custom_confusion_dict
-set_custom_word = corrector.set_custom_word
-set_language_model_path = corrector.set_language_model_path
-correct = corrector.correct
-ngram_score = corrector.ngram_score
-ppl_score = corrector.ppl_score
-word_frequency = corrector.word_frequency
-detect = corrector.detect
-enable_char_error = corrector.enable_char_error
-enable_word_error = corrector.enable_word_error
+# 延迟导入的对象，{name: (module, attr)}
+_lazy_attrs = {
+    'Corrector': ('.corrector', 'Corrector'),
+    'language_model_memory': ('.utils.lm_registry', 'language_model_memory'),
+    'get_homophones_by_char': ('.utils.text_utils', 'get_homophones_by_char'),
+    'get_homophones_by_pinyin': ('.utils.text_utils', 'get_homophones_by_pinyin'),
+    'traditional2simplified': ('.utils.text_utils', 'traditional2simplified'),
+    'simplified2traditional': ('.utils.text_utils', 'simplified2traditional'),
+}
+# 默认纠错器的方法
+_corrector_methods = (
+    'get_same_pinyin',
+    'get_same_stroke',
+    'set_custom_confusion_dict',
+    'set_custom_word',
+    'add_custom_words',
+    'remove_custom_words',
+    'update_confusions',
+    'set_language_model_path',
+    'correct',
+    'correct_batch',
+    'correct_document',
+    'ngram_score',
+    'ppl_score',
+    'word_frequency',
+    'detect',
+    'detect_batch',
+    'enable_char_error',
+    'enable_word_error',
+    'enable_result_cache',
+    'enable_candidate_cache',
+    'enable_beam_decode',
+    'result_cache_info',
+)
+_corrector_lock = threading.Lock()
+
+
+def _get_default_corrector():
+    """
+    首次使用时创建默认纠错器，并把其方法绑定为模块函数
+    :return: Corrector
+    """
+    if 'corrector' not in globals():
+        with _corrector_lock:
+            if 'corrector' not in globals():
+                from .corrector import Corrector
+                default_corrector = Corrector(common_char_path=common_char_path,
+                                              same_pinyin_path=same_pinyin_path,
+                                              same_stroke_path=same_stroke_path,
+                                              language_model_path=language_model_path,
+                                              word_freq_path=word_freq_path,
+                                              custom_word_freq_path=custom_word_freq_path,
+                                              custom_confusion_path=custom_confusion_path,
+                                              person_name_path=person_name_path,
+                                              place_name_path=place_name_path,
+                                              stopwords_path=stopwords_path,
+                                              resource_bundle_path=resource_bundle_path,
+                                              language_model_load_method=language_model_load_method)
+                for name in _corrector_methods:
+                    globals()[name] = getattr(default_corrector, name)
+                globals()['corrector'] = default_corrector
+    return globals()['corrector']
+
+
+class _Package(types.ModuleType):
+    """
+    包模块的类，模块级__getattr__需要Python 3.7，定义在模块类上以兼容3.5、3.6
+    """
+
+    def __setattr__(self, name, value):
+        # 导入子模块pycorrector.corrector时，import机制会把包属性corrector设为该子模块，
+        # 保留其为默认纠错器，与之前版本一致
+        if name == 'corrector' and isinstance(value, types.ModuleType):
+            return
+        super(_Package, self).__setattr__(name, value)
+
+    def __getattr__(self, name):
+        if name == 'corrector':
+            return _get_default_corrector()
+        if name in _corrector_methods:
+            return getattr(_get_default_corrector(), name)
+        if name in _lazy_attrs:
+            module_name, attr = _lazy_attrs[name]
+            value = getattr(importlib.import_module(module_name, __name__), attr)
+            globals()[name] = value
+            return value
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+    def __dir__(self):
+        return sorted(set(globals()) | set(_lazy_attrs) | set(_corrector_methods) | {'corrector'})
+
+
+sys.modules[__name__].__class__ = _Package
@@ -1,10 +1,10 @@
 import re
 
 import Levenshtein as leven
-from pypinyin import pinyin, Style
 
 from detector import Detector
 from utils.cpca import transform, province_map
+from utils.pinyin_service import get_pinyin_service
 
 
 def reverse_dict_with_not_unique_value(dic: dict):
@@ -52,10 +52,10 @@ class AddressCorrector(Detector):
                     continue
                 sentence_before = sentence_to_correct[:i]
                 sentence_after = sentence_to_correct[i + window_size:]
-                running_word_pinyins = pinyin(running_word, style=Style.TONE3)
+                running_word_pinyins = get_pinyin_service().pinyin(running_word, 'tone3')
                 for word_to_detect in words_to_detect:  # 检测与相同长度不同备选词编辑距离
                     assert len(word_to_detect) == len(running_word)
-                    pinyins_to_detect = pinyin(word_to_detect, style=Style.TONE3)
+                    pinyins_to_detect = get_pinyin_service().pinyin(word_to_detect, 'tone3')
                     dist = 0.0
                     for running_py, to_detect_py in zip(running_word_pinyins, pinyins_to_detect):
                         # 计算编辑距离
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Author: XuMing <xuming624@qq.com>
+# Brief: 编译词典资源包，加速Detector/Corrector启动
+# usage: python -m pycorrector.build_bundle [--bundle_path PATH]
+import argparse
+import time
+
+from pycorrector.config import common_char_path, same_pinyin_path, same_stroke_path, language_model_path, \
+    word_freq_path, custom_confusion_path, custom_word_freq_path, place_name_path, person_name_path, \
+    stopwords_path, resource_bundle_path
+from pycorrector.corrector import Corrector
+
+
+def build_bundle(bundle_path=resource_bundle_path):
+    """
+    解析默认词典并写入资源包，源文件未变化的部分直接复用，逐字拼音表和拼音倒排索引一并编译
+    资源包中的word_freq读取时仍需整体反序列化，需更快启动时另设word_freq_table_dir改用mmap映射的词频表
+    :param bundle_path: 资源包路径
+    :return:
+    """
+    t1 = time.time()
+    corrector = Corrector(common_char_path=common_char_path,
+                          same_pinyin_path=same_pinyin_path,
+                          same_stroke_path=same_stroke_path,
+                          language_model_path=language_model_path,
+                          word_freq_path=word_freq_path,
+                          custom_word_freq_path=custom_word_freq_path,
+                          custom_confusion_path=custom_confusion_path,
+                          person_name_path=person_name_path,
+                          place_name_path=place_name_path,
+                          stopwords_path=stopwords_path,
+                          resource_bundle_path=bundle_path)
+    corrector.compile_resources()
+    print('Built resource bundle: %s, spend: %.3f s' % (bundle_path, time.time() - t1))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='compile pycorrector dictionaries into a resource bundle')
+    parser.add_argument('--bundle_path', type=str, default=resource_bundle_path, help='resource bundle path')
+    args = parser.parse_args()
+    build_bundle(args.bundle_path)
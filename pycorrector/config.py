@@ -18,6 +18,8 @@ language_model_path = this_dir + "/" + '../data/language_model_data/renmin/peopl
 #language_model_path = this_dir + "/" + '../data/language_model_data/renmin/people2014corpus_chars.klm'
 #language_model_path = this_dir + "/" + '../data/language_model_data/wiki/lm_char.klm'
 # language_model_path = this_dir + "/" +'../data/kenlm/char_kenlm.model'
+# 语言模型加载方式：lazy, populate_or_read, populate_or_lazy, read, parallel_read
+language_model_load_method = 'populate_or_read'
 # 用户自定义错别字混淆集  format:变体	本体   本体词词频（可省略）
 custom_confusion_path = this_dir + "/" + 'data/custom_confusion.txt'
 # 用户自定义分词词典  format: 词语 词频
@@ -28,3 +30,9 @@ person_name_path = this_dir + "/" + 'data/person_name.txt'
 place_name_path = this_dir + "/" + 'data/place_name.txt'
 # 停用词
 stopwords_path = this_dir + "/" + 'data/stopwords.txt'
+# 编译后的词典资源包，源文件变化时自动重建
+resource_bundle_path = os.path.join(os.path.expanduser('~'), '.pycorrector', 'resources.bundle')
+# 英文纠错的删除变体索引缓存
+en_spell_index_path = os.path.join(os.path.expanduser('~'), '.pycorrector', 'en_spell_index.bundle')
+# 英文纠错的语料词频表目录
+en_spell_table_dir = os.path.join(os.path.expanduser('~'), '.pycorrector')
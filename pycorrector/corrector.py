@@ -6,14 +6,18 @@ import operator
 import os
 import time
 
+import kenlm
 import numpy as np
-from sklearn import metrics
-from pypinyin import lazy_pinyin
 
-from pycorrector.detector import Detector, error_type
+from pycorrector.detector import Detector, error_type, LM_WHITESPACE
+from pycorrector.utils.bundle import get_resource_bundle
+from pycorrector.utils.confusion_char_table import ConfusionCharTable
 from pycorrector.utils.io_utils import get_logger
+from pycorrector.utils.lru_cache import LRUCache
+from pycorrector.utils.pinyin_service import get_pinyin_service, load_char_table
 from pycorrector.utils.math_utils import edit_distance_word
-from pycorrector.utils.text_utils import is_chinese_string
+from pycorrector.utils.pinyin_word_index import PinyinWordIndex, pinyin_key
+from pycorrector.utils.text_utils import is_chinese_string, split_2_short_text
 
 default_logger = get_logger(__file__)
 pwd_path = os.path.abspath(os.path.dirname(__file__))
@@ -89,7 +93,11 @@ class Corrector(Detector):
                  custom_confusion_path='data/custom_confusion.txt',
                  person_name_path='data/person_name.txt',
                  place_name_path='data/place_name.txt',
-                 stopwords_path='data/stopwords.txt'
+                 stopwords_path='data/stopwords.txt',
+                 resource_bundle_path='',
+                 word_freq_table_dir='',
+                 language_model_load_method='populate_or_read',
+                 confusion_char_top_k=0
                  ):
         super(Corrector, self).__init__(language_model_path=language_model_path,
                                         word_freq_path=word_freq_path,
@@ -97,26 +105,64 @@ class Corrector(Detector):
                                         custom_confusion_path=custom_confusion_path,
                                         person_name_path=person_name_path,
                                         place_name_path=place_name_path,
-                                        stopwords_path=stopwords_path
+                                        stopwords_path=stopwords_path,
+                                        resource_bundle_path=resource_bundle_path,
+                                        word_freq_table_dir=word_freq_table_dir,
+                                        language_model_load_method=language_model_load_method
                                         )
         self.name = 'corrector'
         self.common_char_path = os.path.join(pwd_path, common_char_path)
         self.same_pinyin_text_path = os.path.join(pwd_path, same_pinyin_path)
         self.same_stroke_text_path = os.path.join(pwd_path, same_stroke_path)
         self.initialized_corrector = False
+        # correct结果缓存，默认关闭
+        self.correct_cache = None
+        # 词典的拼音倒排索引，prepare_fork时构建，开启资源包时首次取同音词从资源包读取；未构建时逐个比较候选词的拼音
+        self.pinyin_word_index = None
+        # 同音字和形似字合并后的混淆字表，每个字最多保留confusion_char_top_k个高频候选字，0为不截断
+        self.confusion_char_top_k = confusion_char_top_k
+        self.confusion_char_table = None
+        # 联合解码的束宽，0为逐个疑似错误贪心纠正
+        self.beam_size = 0
+        # 候选集缓存，键含词典版本号，词典变化后旧结果不再命中
+        self.candidate_cache = None
+        self.confusion_word_cache = None
+        self.enable_candidate_cache()
 
     def initialize_corrector(self):
         t1 = time.time()
         # chinese common char dict
-        self.cn_char_set = load_char_set(self.common_char_path)
+        self.cn_char_set = self._load_resource('char_set', self.common_char_path, load_char_set)
         # same pinyin
-        self.same_pinyin = load_same_pinyin(self.same_pinyin_text_path)
+        self.same_pinyin = self._load_resource('same_pinyin', self.same_pinyin_text_path, load_same_pinyin)
         # same stroke
-        self.same_stroke = load_same_stroke(self.same_stroke_text_path)
+        self.same_stroke = self._load_resource('same_stroke', self.same_stroke_text_path, load_same_stroke)
+        # 开启资源包时预先从资源包加载进程内共享的拼音服务，否则在首次用到拼音时才构建
+        if self.resource_bundle_path:
+            get_pinyin_service(self.resource_bundle_path)
+        self._save_resource_bundle()
         default_logger.debug("Loaded same pinyin file: %s, same stroke file: %s, spend: %.3f s." % (
             self.same_pinyin_text_path, self.same_stroke_text_path, time.time() - t1))
         self.initialized_corrector = True
 
+    def compile_resources(self):
+        """
+        把文本词典及由其派生的逐字拼音表、拼音倒排索引编译进资源包（不加载语言模型），可在部署时预先执行
+        :return:
+        """
+        self._load_resource('char_set', self.common_char_path, load_char_set)
+        self._load_resource('same_pinyin', self.same_pinyin_text_path, load_same_pinyin)
+        self._load_resource('same_stroke', self.same_stroke_text_path, load_same_stroke)
+        super(Corrector, self).compile_resources()
+        if not self.resource_bundle_path:
+            return
+        # 构建最耗时的两项，拼音倒排索引用到拼音服务，先编译逐字拼音表
+        load_char_table(self.resource_bundle_path)
+        get_pinyin_service(self.resource_bundle_path)
+        bundle = get_resource_bundle(self.resource_bundle_path)
+        bundle.get('pinyin_word_index', self._word_freq_sources(), lambda: PinyinWordIndex(self._merged_word_freq()))
+        self._save_resource_bundle()
+
     def check_corrector_initialized(self):
         if not self.initialized_corrector:
             self.initialize_corrector()
@@ -147,17 +193,94 @@ class Corrector(Detector):
         """
         return set(word for word in words if word in self.word_freq)
 
+    def _get_confusion_char_table(self):
+        if self.confusion_char_table is None:
+            self.check_corrector_initialized()
+            self.confusion_char_table = ConfusionCharTable(self.same_pinyin, self.same_stroke,
+                                                           freq_func=self.word_frequency,
+                                                           top_k=self.confusion_char_top_k)
+        return self.confusion_char_table
+
     def _confusion_char_set(self, c):
-        return self.get_same_pinyin(c).union(self.get_same_stroke(c))
+        """
+        取同音字和形似字，按字频降序
+        :param c:
+        :return: tuple
+        """
+        return self._get_confusion_char_table().get(c)
+
+    def _get_pinyin_word_index(self):
+        """
+        取word_freq的拼音倒排索引，词典未修改过时从资源包读取
+        在dict_lock内构建，构建期间的词典更新不会丢失
+        :return: PinyinWordIndex
+        """
+        if self.pinyin_word_index is None:
+            with self.dict_lock:
+                if self.pinyin_word_index is None:
+                    t1 = time.time()
+                    if self.resource_bundle_path and self.dict_version == 0:
+                        bundle = get_resource_bundle(self.resource_bundle_path)
+                        self.pinyin_word_index = bundle.get('pinyin_word_index', self._word_freq_sources(),
+                                                            lambda: PinyinWordIndex(self.word_freq))
+                        self._save_resource_bundle()
+                    else:
+                        self.pinyin_word_index = PinyinWordIndex(self.word_freq)
+                    default_logger.debug('Built pinyin word index, size: %d, spend: %.3f s' % (
+                        len(self.pinyin_word_index), time.time() - t1))
+        return self.pinyin_word_index
+
+    def _prepare_word_freq_change(self, words, word_freq):
+        # 拼音倒排索引已构建时，在dict_lock之外算好索引的修改
+        pinyin_word_index = self.pinyin_word_index
+        if pinyin_word_index is None:
+            return None
+        return pinyin_word_index, pinyin_word_index.prepare_update(words, word_freq)
+
+    def _word_freq_changed(self, words, prepared=None):
+        words = list(words)
+        # 字频变化后混淆字表的排序和截断随之变化，下次使用时重建
+        if self.confusion_char_table is not None and any(len(word) == 1 for word in words):
+            self.confusion_char_table = None
+        if self.pinyin_word_index is None:
+            return
+        if prepared is None or prepared[0] is not self.pinyin_word_index:
+            # 索引在准备之后才构建，下次使用时按新词典重建
+            self.pinyin_word_index = None
+            return
+        self.pinyin_word_index.apply_update(prepared[1])
 
     def _confusion_word_set(self, word):
-        confusion_word_set = set()
-        candidate_words = list(self.known(edit_distance_word(word, self.cn_char_set)))
-        for candidate_word in candidate_words:
-            if lazy_pinyin(candidate_word) == lazy_pinyin(word):
-                # same pinyin
-                confusion_word_set.add(candidate_word)
-        return confusion_word_set
+        """
+        取同音的编辑距离为1的常用词（交换相邻两字或替换一个常用字）
+        :param word:
+        :return: set
+        """
+        if self.confusion_word_cache is None:
+            return self._same_pinyin_words(word)
+        key = (word, self.dict_version)
+        confusion_word_set = self.confusion_word_cache.get(key)
+        if confusion_word_set is None:
+            confusion_word_set = self._same_pinyin_words(word)
+            self.confusion_word_cache.put(key, confusion_word_set)
+        # 返回副本，避免调用方修改缓存内容
+        return set(confusion_word_set)
+
+    def _same_pinyin_words(self, word):
+        """
+        取同音的编辑距离为1的常用词，拼音倒排索引已构建或可从资源包读取时查索引，
+        否则逐个比较候选词的拼音，不在首次纠错时为整个词典计算拼音
+        :param word:
+        :return: set
+        """
+        pinyin_word_index = self.pinyin_word_index
+        if pinyin_word_index is None and self.resource_bundle_path and self.dict_version == 0:
+            pinyin_word_index = self._get_pinyin_word_index()
+        if pinyin_word_index is not None:
+            return pinyin_word_index.same_pinyin_words(word, self.cn_char_set)
+        key = pinyin_key(word)
+        return set(candidate for candidate in self.known(edit_distance_word(word, self.cn_char_set))
+                   if pinyin_key(candidate) == key)
 
     def _confusion_custom_set(self, word):
         confusion_word_set = set()
@@ -165,14 +288,34 @@ class Corrector(Detector):
             confusion_word_set = {self.custom_confusion[word]}
         return confusion_word_set
 
-    # TODO: need more faster
+    def enable_candidate_cache(self, enable=True, maxsize=10000):
+        """
+        is open candidate cache, 相同的疑似错误词直接取缓存的纠错候选集，词典变化后自动失效
+        :param enable:
+        :param maxsize: generate_items和同音词候选各自的最大缓存词数
+        :return:
+        """
+        self.candidate_cache = LRUCache(maxsize) if enable else None
+        self.confusion_word_cache = LRUCache(maxsize) if enable else None
+
     def generate_items(self, word, fraction=1):
         """
         生成纠错候选集
         :param word:
         :param fraction:
-        :return:
+        :return: list, 按词频降序
         """
+        if self.candidate_cache is None:
+            return self._generate_items(word, fraction)
+        key = (word, fraction, self.dict_version)
+        items = self.candidate_cache.get(key)
+        if items is None:
+            items = self._generate_items(word, fraction)
+            self.candidate_cache.put(key, items)
+        # 返回副本，lm_correct_item会修改候选列表
+        return list(items)
+
+    def _generate_items(self, word, fraction=1):
         candidates_1_order = []
         candidates_2_order = []
         candidates_3_order = []
@@ -213,17 +356,23 @@ class Corrector(Detector):
         # print("纠错候选集 maybe_right_items:{}".format(confusion_sorted[:len(confusion_word_list) // fraction + 1]))
         return confusion_sorted[:len(confusion_word_list) // fraction + 1]
 
-    def lm_correct_item(self, item, maybe_right_items, before_sent, after_sent):
+    def lm_correct_item(self, item, maybe_right_items, before_sent, after_sent, budget=None):
         """
         通过语音模型纠正字词错误
+        :param budget: BudgetTracker, 打分次数不足时只对高频的候选词打分，已超时则不打分，保留原词
         """
+        if budget is not None and budget.check_expired():
+            return item
         if item not in maybe_right_items:
             maybe_right_items.append(item)
+        if budget is not None:
+            maybe_right_items = maybe_right_items[:budget.take_lm_queries(len(maybe_right_items) + 1) - 1]
         res = []
-        ori_score = self.ppl_score(before_sent + item + after_sent)
+        # 只对候选词附近的窗口重新打分，结果与逐个计算整句困惑度一致
+        scores = self.ppl_scores_in_context([item] + maybe_right_items, before_sent, after_sent)
+        ori_score = scores[0]
         print("ori_item 「{}」 - score: {}".format(item, ori_score))
-        for maybe_right_item in maybe_right_items:
-            score = self.ppl_score(before_sent + maybe_right_item + after_sent)
+        for maybe_right_item, score in zip(maybe_right_items, scores[1:]):
             print("maybe_right_item 「{}」 - score: {}".format(maybe_right_item, score))
             res.append(score)
         min_idx = np.argmin(res)
@@ -250,12 +399,220 @@ class Corrector(Detector):
 
         return maybe_errors
 
-    def correct(self, sentence, golden=None):
+    def prepare_fork(self):
+        """
+        fork子进程前构建拼音服务、混淆字表和拼音倒排索引，子进程共享这些内存页，不必各自构建
+        :return:
+        """
+        super(Corrector, self).prepare_fork()
+        self.check_corrector_initialized()
+        get_pinyin_service(self.resource_bundle_path)
+        self._get_confusion_char_table()
+        self._get_pinyin_word_index()
+
+    def correct_batch(self, sentences, n_jobs=None, chunksize=None):
+        """
+        批量句子改错
+        :param sentences: list, 句子列表
+        :param n_jobs: 进程数，None时取CPU核数
+        :param chunksize: 每次分发给子进程的句子数
+        :return: list, 与输入顺序一致的(改正后的句子, list(wrong, right, begin_idx, end_idx))
+        """
+        return self._run_batch('_correct_sentences', sentences, n_jobs=n_jobs, chunksize=chunksize)
+
+    def _correct_sentences(self, sentences):
+        return [self.correct(sentence) for sentence in sentences]
+
+    def correct_document(self, text, n_jobs=1, chunksize=None):
+        """
+        长文本改错，按分句标点切分为短句分别纠错，检测统计量和困惑度计算不随文本长度增长
+        :param text: 长文本
+        :param n_jobs: 进程数，默认在当前进程串行处理，None时取CPU核数
+        :param chunksize: 每次分发给子进程的短句数
+        :return: 改正后的文本, list(wrong, right, begin_idx, end_idx)，位置为原文中的位置
+        """
+        clauses = split_2_short_text(text)
+        if not clauses:
+            return text, []
+        results = self.correct_batch([clause for clause, _ in clauses], n_jobs=n_jobs, chunksize=chunksize)
+        corrected_clauses = []
+        detail = []
+        for (clause, clause_begin_idx), (corrected_clause, clause_detail) in zip(clauses, results):
+            corrected_clauses.append(corrected_clause)
+            for wrong, right, begin_idx, end_idx in clause_detail:
+                detail.append([wrong, right, clause_begin_idx + begin_idx, clause_begin_idx + end_idx])
+        return ''.join(corrected_clauses), detail
+
+    def enable_result_cache(self, enable=True, maxsize=100000):
+        super(Corrector, self).enable_result_cache(enable, maxsize)
+        self.correct_cache = LRUCache(maxsize) if enable else None
+
+    def result_cache_info(self):
+        info = super(Corrector, self).result_cache_info()
+        if self.correct_cache is not None:
+            info['correct'] = self.correct_cache.info()
+        if self.candidate_cache is not None:
+            info['generate_items'] = self.candidate_cache.info()
+        if self.confusion_word_cache is not None:
+            info['confusion_word_set'] = self.confusion_word_cache.info()
+        return info
+
+    def correct(self, sentence, golden=None, budget=None):
         """
         句子改错
         :param sentence: 句子文本
+        :param budget: CorrectionBudget, 单次纠错的资源预算，为空则不限
+        :return: 改正后的句子, list(wrong, right, begin_idx, end_idx)；
+        给定budget时另返回degraded，为True表示预算耗尽，结果只纠正了部分疑似错误或只比较了部分候选词
+        """
+        # 等待词典更新锁的时间也计入预算
+        tracker = budget.start() if budget is not None else None
+        with self.dict_lock:
+            result = self._correct_cached(sentence, golden, tracker)
+        if tracker is None:
+            return result
+        return tuple(result) + (tracker.degraded,)
+
+    def _correct_cached(self, sentence, golden=None, budget=None):
+        if golden or self.correct_cache is None:
+            return self._correct(sentence, golden, budget)
+        # 纠错时语言模型对原句打分，缓存键取原句而非归一化后的句子
+        key = self._result_cache_key(sentence) + (self.beam_size,)
+        result = self.correct_cache.get(key)
+        if result is None:
+            result = self._correct(sentence, budget=budget)
+            # 降级的结果与不限预算时不同，不缓存
+            if budget is None or not budget.degraded:
+                self.correct_cache.put(key, result)
+        corrected_sentence, detail = result
+        return corrected_sentence, [list(detail_word) for detail_word in detail]
+
+    def enable_beam_decode(self, enable=True, beam_size=8):
+        """
+        is open beam decode, 对全部疑似错误的候选构建词格，从左到右一遍束搜索取联合最优的改正结果
+        :param enable:
+        :param beam_size: 束宽
+        :return:
+        """
+        self.beam_size = beam_size if enable else 0
+
+    def _build_lattice(self, sentence, budget=None):
+        """
+        构建词格：按位置排列的互不重叠的疑似错误及其候选词（含原词）
+        :param sentence:
+        :param budget: BudgetTracker, 超出疑似错误数或候选词数的部分不纠正
+        :return: list of (item, begin_idx, end_idx, candidates, 不改正时的取值)
+        """
+        lattice = []
+        last_end_idx = 0
+        for item, begin_idx, end_idx, err_type in sorted(self.detect(sentence), key=operator.itemgetter(1)):
+            if begin_idx < last_end_idx:
+                continue
+            if err_type == error_type["confusion"]:
+                # 困惑集中指定的词，直接取结果
+                candidates = [self.custom_confusion[item]]
+                origin = candidates[0]
+            else:
+                # 对非中文的错字不做处理
+                if not is_chinese_string(item):
+                    continue
+                if budget is not None and not budget.allow_suspect():
+                    continue
+                candidates = self.generate_items(item)
+                if not candidates:
+                    continue
+                if budget is not None:
+                    # 生成候选词后已超时，不再打分，保留原词
+                    if budget.check_expired():
+                        continue
+                    candidates = budget.limit_candidates(candidates)
+                if item not in candidates:
+                    candidates.append(item)
+                origin = item
+            lattice.append((item, begin_idx, end_idx, candidates, origin))
+            last_end_idx = end_idx
+        return lattice
+
+    def _correct_beam(self, sentence, threshold=2, budget=None):
+        """
+        词格束搜索纠错，假设为(累计得分, 字数, kenlm状态, 各位置所选候选)，kenlm状态和字数相同的假设只保留得分最高的；
+        最优结果的困惑度比不改正（困惑集的词仍直接改正）时低threshold以上才采用，与贪心纠错的规则一致
+        :param sentence: 句子文本
+        :param threshold: 困惑度阈值
+        :param budget: BudgetTracker, 超时或打分次数不足后，其余位置只保留不改正时的取值
         :return: 改正后的句子, list(wrong, right, begin_idx, end_idx)
         """
+        self.check_corrector_initialized()
+        self.check_detector_initialized()
+        lattice = self._build_lattice(sentence, budget)
+        base_score = self.lm.BaseScore
+
+        def advance(hypothesis, text, choice=None):
+            score, token_count, state, choices = hypothesis
+            for char in text:
+                if char in LM_WHITESPACE:
+                    continue
+                out_state = kenlm.State()
+                score += base_score(state, char, out_state)
+                state = out_state
+                token_count += 1
+            if choice is not None:
+                choices = choices + (choice,)
+            return score, token_count, state, choices
+
+        def prune(hypotheses):
+            best = {}
+            for hypothesis in hypotheses:
+                key = (hypothesis[2], hypothesis[1])
+                if key not in best or best[key][0] < hypothesis[0]:
+                    best[key] = hypothesis
+            # 候选词长度可能不同，按平均每字得分排序
+            return sorted(best.values(), key=lambda k: k[0] / (k[1] + 1), reverse=True)[:self.beam_size]
+
+        begin_state = kenlm.State()
+        self.lm.BeginSentenceWrite(begin_state)
+        beam = [(0.0, 0, begin_state, ())]
+        last_end_idx = 0
+        for item, begin_idx, end_idx, candidates, origin in lattice:
+            beam = prune([advance(hypothesis, sentence[last_end_idx:begin_idx]) for hypothesis in beam])
+            if budget is not None and len(candidates) > 1:
+                if budget.expired():
+                    budget.degraded = True
+                    candidates = [origin]
+                else:
+                    # 每个假设接每个候选词计一次打分
+                    granted = budget.take_lm_queries(len(beam) * len(candidates)) // len(beam)
+                    if granted < len(candidates):
+                        candidates = [origin] + [c for c in candidates if c != origin][:max(granted - 1, 0)]
+            beam = prune([advance(hypothesis, candidate, candidate)
+                          for hypothesis in beam for candidate in candidates])
+            last_end_idx = end_idx
+        beam = [advance(hypothesis, sentence[last_end_idx:]) for hypothesis in beam]
+        best_choices = max(beam, key=lambda k: (k[0] + self.lm.BaseScore(k[2], '</s>', kenlm.State())) / (k[1] + 1))[3]
+
+        def assemble(choices):
+            pieces = []
+            last_end_idx = 0
+            for (item, begin_idx, end_idx, _, _), choice in zip(lattice, choices):
+                pieces.append(sentence[last_end_idx:begin_idx])
+                pieces.append(choice)
+                last_end_idx = end_idx
+            pieces.append(sentence[last_end_idx:])
+            return ''.join(pieces)
+
+        # 不改正时的结果：困惑集位置取指定的词，其余位置取原词
+        origin_choices = tuple(origin for _, _, _, _, origin in lattice)
+        corrected_sentence = assemble(best_choices)
+        if self.ppl_score(assemble(origin_choices)) <= self.ppl_score(corrected_sentence) + threshold:
+            best_choices = origin_choices
+            corrected_sentence = assemble(origin_choices)
+        detail = [[item, choice, begin_idx, end_idx]
+                  for (item, begin_idx, end_idx, _, _), choice in zip(lattice, best_choices) if choice != item]
+        return corrected_sentence, detail
+
+    def _correct(self, sentence, golden=None, budget=None):
+        if self.beam_size and not golden:
+            return self._correct_beam(sentence, budget=budget)
         # TODO：DEBUG
         original_sentence = sentence
         # print("待检句子：「{}」".format(original_sentence))
@@ -291,11 +648,18 @@ class Corrector(Detector):
                 if not is_chinese_string(item):
                     print("对非中文的错字不做处理")
                     continue
+                if budget is not None and not budget.allow_suspect():
+                    continue
                 # 取得所有可能正确的词
                 maybe_right_items = self.generate_items(item)
                 if not maybe_right_items:
                     continue
-                corrected_item = self.lm_correct_item(item, maybe_right_items, before_sent, after_sent)
+                if budget is not None:
+                    # 生成候选词后已超时，不再打分，保留原词
+                    if budget.check_expired():
+                        continue
+                    maybe_right_items = budget.limit_candidates(maybe_right_items)
+                corrected_item = self.lm_correct_item(item, maybe_right_items, before_sent, after_sent, budget)
             # output
             if corrected_item != item:
                 sentence = before_sent + corrected_item + after_sent
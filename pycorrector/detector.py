@@ -2,22 +2,107 @@
 # Author: XuMing <xuming624@qq.com>
 # Brief: error word detect
 import codecs
+import hashlib
+import multiprocessing
+import operator
 import os
+import threading
 import time
+from bisect import bisect_left, bisect_right
 from sys import stderr
 
 import kenlm
 import numpy as np
 
 from pycorrector.tokenizer import Tokenizer
+from pycorrector.utils.bundle import get_resource_bundle, file_signature
+from pycorrector.utils.confusion_dict import ConfusionDict
 from pycorrector.utils.io_utils import get_logger
+from pycorrector.utils.lm_registry import DEFAULT_LOAD_METHOD, get_language_model, release_language_model
+from pycorrector.utils.lru_cache import LRUCache
+from pycorrector.utils.string_table import StringTable, CompactWordFreq
 from pycorrector.utils.text_utils import uniform, is_alphabet_string
 
 logger = get_logger(__file__)
 PUNCTUATION_LIST = "。，,、？：；{}[]【】“‘’”《》/!！%……（）<>@#$~^￥%&*\"\'=+-"
+# kenlm按ASCII空白符切分输入，空白字符不参与打分
+LM_WHITESPACE = " \t\n\r\x0b\x0c"
 pwd_path = os.path.abspath(os.path.dirname(__file__))
 error_type = {"confusion": 1, "word": 2, "char": 3}
 
+class ErrorSpan(object):
+    """
+    疑似错误片段
+    """
+    __slots__ = ('word', 'begin_idx', 'end_idx', 'err_type')
+
+    def __init__(self, word, begin_idx, end_idx, err_type):
+        self.word = word
+        self.begin_idx = begin_idx
+        self.end_idx = end_idx
+        self.err_type = err_type
+
+    def to_list(self):
+        return [self.word, self.begin_idx, self.end_idx, self.err_type]
+
+
+class ErrorSpanIndex(object):
+    """
+    一个句子的疑似错误集合，按区间去重：已被某个错误区间包含的新错误不再加入
+    只维护不被其他区间包含的区间（起止位置均严格递增），包含判断为二分查找
+    """
+    __slots__ = ('spans', 'begins', 'ends')
+
+    def __init__(self):
+        self.spans = []
+        self.begins = []
+        self.ends = []
+
+    def __len__(self):
+        return len(self.spans)
+
+    def contains(self, begin_idx, end_idx):
+        """
+        是否已有错误区间包含[begin_idx, end_idx)
+        :param begin_idx:
+        :param end_idx:
+        :return: bool
+        """
+        i = bisect_right(self.begins, begin_idx) - 1
+        return i >= 0 and self.ends[i] >= end_idx
+
+    def add(self, word, begin_idx, end_idx, err_type):
+        """
+        新增错误
+        :return: bool, 是否加入
+        """
+        if self.contains(begin_idx, end_idx):
+            return False
+        # 新区间包含的区间不再参与包含判断
+        lo = bisect_left(self.begins, begin_idx)
+        hi = lo
+        while hi < len(self.ends) and self.ends[hi] <= end_idx:
+            hi += 1
+        self.begins[lo:hi] = [begin_idx]
+        self.ends[lo:hi] = [end_idx]
+        self.spans.append(ErrorSpan(word, begin_idx, end_idx, err_type))
+        return True
+
+    def to_list(self):
+        """
+        :return: 按起始位置排序的[error_word, begin_pos, end_pos, error_type]列表
+        """
+        return [span.to_list() for span in sorted(self.spans, key=operator.attrgetter('begin_idx'))]
+
+
+# 批量处理时fork出的子进程通过该全局变量使用父进程已加载的模型和词典（写时复制共享内存页）
+_forked_detector = None
+_forked_method = ''
+
+
+def _call_forked_method(sentences):
+    return getattr(_forked_detector, _forked_method)(sentences)
+
 
 class Detector(object):
     def __init__(self,
@@ -27,45 +112,84 @@ class Detector(object):
                  custom_confusion_path='',
                  person_name_path='',
                  place_name_path='',
-                 stopwords_path=''):
+                 stopwords_path='',
+                 resource_bundle_path='',
+                 word_freq_table_dir='',
+                 language_model_load_method=DEFAULT_LOAD_METHOD):
         self.name = 'detect'
         self.language_model_path = os.path.join(pwd_path, language_model_path)
+        # kenlm加载方式，见pycorrector.utils.lm_registry.LOAD_METHODS
+        self.language_model_load_method = language_model_load_method
+        # 最近一次set_language_model_path加载失败的异常，成功切换后为None
+        self.language_model_error = None
         self.word_freq_path = os.path.join(pwd_path, word_freq_path)
         self.custom_word_freq_path = os.path.join(pwd_path, custom_word_freq_path)
         self.custom_confusion_path = os.path.join(pwd_path, custom_confusion_path)
         self.person_name_path = os.path.join(pwd_path, person_name_path)
         self.place_name_path = os.path.join(pwd_path, place_name_path)
         self.stopwords_path = os.path.join(pwd_path, stopwords_path)
+        # 编译后的词典资源包，为空则每次启动都解析文本词典
+        self.resource_bundle_path = os.path.join(pwd_path, resource_bundle_path) if resource_bundle_path else ''
+        # 合并后的词频表目录，设置后word_freq改为mmap映射的只读词频表，多进程共享内存
+        self.word_freq_table_dir = os.path.join(pwd_path, word_freq_table_dir) if word_freq_table_dir else ''
         self.is_char_error_detect = True
         self.is_word_error_detect = True
+        # 通顺句子快速通道：整句平均字得分不低于阈值且未登录字不多于max_oov时，跳过切词和字窗口扫描
+        self.fast_path_threshold = None
+        self.fast_path_max_oov = 0
         self.initialized_detector = False
+        # 字窗口前缀 => (得分, kenlm状态) 缓存
+        self.window_state_cache = {}
+        self.window_state_cache_size = 200000
+        # 上次打分句子的左侧上下文: (语言模型, 字列表, 每个前缀之后的kenlm状态, 每个前缀的float32累计得分)
+        self.lm_prefix_cache = (None, [], [], [])
+        # 词典版本号，修改词典、混淆集或语言模型时递增，作为结果缓存键的一部分
+        self.dict_version = 0
+        # detect结果缓存，默认关闭
+        self.detect_cache = None
+        # 检测、纠错持有该锁读取词典；增量更新词典时持有该锁修改，读取方不会看到更新到一半的词典
+        self.dict_lock = threading.RLock()
+        # 串行化词典更新，耗时的构建步骤在dict_lock之外完成
+        self.dict_update_lock = threading.Lock()
 
     def initialize_detector(self):
         t1 = time.time()
-        self.lm = kenlm.Model(self.language_model_path)
+        self.lm = get_language_model(self.language_model_path, self.language_model_load_method)
+        self.window_state_cache = {}
         t2 = time.time()
         logger.debug(
             'Loaded language model: %s, spend: %s s' % (self.language_model_path, str(t2 - t1)))
         # 词、频数dict
-        self.word_freq = self.load_word_freq_dict(self.word_freq_path)
+        table_path = self._word_freq_table_path() if self.word_freq_table_dir else ''
+        if table_path and os.path.exists(table_path):
+            self.word_freq = CompactWordFreq(StringTable(table_path))
+        else:
+            self.word_freq = self._load_resource('word_freq', self.word_freq_path, self.load_word_freq_dict)
         t3 = time.time()
         logger.debug('Loaded word freq file: %s, size: %d, spend: %s s' %
                      (self.word_freq_path, len(self.word_freq), str(t3 - t2)))
         # 自定义混淆集
-        self.custom_confusion = self._get_custom_confusion_dict(self.custom_confusion_path)
+        self.custom_confusion = ConfusionDict(self._get_custom_confusion_dict(self.custom_confusion_path))
         t4 = time.time()
         logger.debug('Loaded confusion file: %s, size: %d, spend: %s s' %
                      (self.custom_confusion_path, len(self.custom_confusion), str(t4 - t3)))
         # 自定义切词词典
-        self.custom_word_freq = self.load_word_freq_dict(self.custom_word_freq_path)
-        self.person_names = self.load_word_freq_dict(self.person_name_path)
-        self.place_names = self.load_word_freq_dict(self.place_name_path)
-        self.stopwords = self.load_word_freq_dict(self.stopwords_path)
+        self.custom_word_freq = self._load_resource('word_freq', self.custom_word_freq_path, self.load_word_freq_dict)
+        self.person_names = self._load_resource('word_freq', self.person_name_path, self.load_word_freq_dict)
+        self.place_names = self._load_resource('word_freq', self.place_name_path, self.load_word_freq_dict)
+        self.stopwords = self._load_resource('word_freq', self.stopwords_path, self.load_word_freq_dict)
         # 合并切词词典及自定义词典
         self.custom_word_freq.update(self.person_names)
         self.custom_word_freq.update(self.place_names)
         self.custom_word_freq.update(self.stopwords)
 
+        # 词频表只存基础词典，自定义词放在进程内的修改中，删除自定义词时可以从表中恢复基础词频
+        if table_path and not isinstance(self.word_freq, CompactWordFreq):
+            StringTable.build(self.word_freq, table_path)
+            self.word_freq = CompactWordFreq(StringTable(table_path))
+        # 被自定义词覆盖的基础词频，删除自定义词时据此恢复
+        self.shadowed_word_freq = {word: self.word_freq[word] for word in self.custom_word_freq
+                                   if word in self.word_freq}
         self.word_freq.update(self.custom_word_freq)
         t5 = time.time()
         logger.debug('Loaded custom word file: %s, size: %d, spend: %s s' %
@@ -73,6 +197,7 @@ class Detector(object):
         logger.debug('Loaded all word freq file done, size: %d' % len(self.word_freq))
         self.tokenizer = Tokenizer(dict_path=self.word_freq_path, custom_word_freq_dict=self.custom_word_freq,
                                    custom_confusion_dict=self.custom_confusion)
+        self._save_resource_bundle()
         t6 = time.time()
         logger.info('Loaded dict ok, spend: %s s' % str(t6 - t1))
         self.initialized_detector = True
@@ -81,6 +206,60 @@ class Detector(object):
         if not self.initialized_detector:
             self.initialize_detector()
 
+    def _load_resource(self, name, path, loader):
+        """
+        加载词典资源，开启资源包时源文件未变化则直接读取编译后的结果
+        :param name: 资源类型
+        :param path: 源文件路径
+        :param loader: 解析源文件的函数
+        :return:
+        """
+        if not self.resource_bundle_path:
+            return loader(path)
+        bundle = get_resource_bundle(self.resource_bundle_path)
+        return bundle.get(name, (path,), lambda: loader(path))
+
+    def _word_freq_sources(self):
+        """
+        合并到word_freq的各源词典
+        :return: list
+        """
+        return [self.word_freq_path, self.custom_confusion_path, self.custom_word_freq_path,
+                self.person_name_path, self.place_name_path, self.stopwords_path]
+
+    def _word_freq_table_path(self):
+        """
+        基础词频表文件路径，由各源词典的路径、大小和修改时间决定，源词典变化则生成新表
+        :return:
+        """
+        key = repr([(path, file_signature(path)) for path in self._word_freq_sources()])
+        return os.path.join(self.word_freq_table_dir,
+                            'word_freq_base_%s.table' % hashlib.md5(key.encode('utf-8')).hexdigest())
+
+    def compile_resources(self):
+        """
+        把文本词典编译进资源包（不加载语言模型），可在部署时预先执行
+        :return:
+        """
+        self._merged_word_freq()
+        self._save_resource_bundle()
+
+    def _merged_word_freq(self):
+        """
+        合并各源词典，与initialize_detector得到的word_freq一致，不加载语言模型
+        :return: dict, {word: freq}
+        """
+        word_freq = self._load_resource('word_freq', self.word_freq_path, self.load_word_freq_dict)
+        _, origin_freq = self._load_resource('confusion', self.custom_confusion_path, self.load_custom_confusion_dict)
+        word_freq.update(origin_freq)
+        for path in [self.custom_word_freq_path, self.person_name_path, self.place_name_path, self.stopwords_path]:
+            word_freq.update(self._load_resource('word_freq', path, self.load_word_freq_dict))
+        return word_freq
+
+    def _save_resource_bundle(self):
+        if self.resource_bundle_path:
+            get_resource_bundle(self.resource_bundle_path).save()
+
     @staticmethod
     def load_word_freq_dict(path):
         """
@@ -103,13 +282,15 @@ class Detector(object):
                 word_freq[word] = freq
         return word_freq
 
-    def _get_custom_confusion_dict(self, path):
+    @staticmethod
+    def load_custom_confusion_dict(path):
         """
-        取自定义困惑集
+        加载自定义困惑集
         :param path:
-        :return: dict, {variant: origin}, eg: {"交通先行": "交通限行"}
+        :return: (dict, {variant: origin}; dict, {origin: freq})
         """
         confusion = {}
+        origin_freq = {}
         with codecs.open(path, 'r', encoding='utf-8') as f:
             for line in f:
                 line = line.strip()
@@ -121,34 +302,206 @@ class Detector(object):
                 variant = info[0]
                 origin = info[1]
                 freq = int(info[2]) if len(info) > 2 else 1
-                self.word_freq[origin] = freq
+                origin_freq[origin] = freq
                 confusion[variant] = origin
+        return confusion, origin_freq
+
+    def _get_custom_confusion_dict(self, path):
+        """
+        取自定义困惑集，本体词及词频并入词频词典
+        :param path:
+        :return: dict, {variant: origin}, eg: {"交通先行": "交通限行"}
+        """
+        confusion, origin_freq = self._load_resource('confusion', path, self.load_custom_confusion_dict)
+        self.word_freq.update(origin_freq)
         return confusion
 
-    def set_language_model_path(self, path):
+    def set_language_model_path(self, path, background=False):
+        """
+        切换语言模型，新模型加载完成前仍用旧模型检测，加载完成后与字窗口缓存一起原子切换
+        :param path: 语言模型文件路径
+        :param background: 是否在后台线程加载，为True时立即返回该线程，
+                           加载失败时仍用旧模型，异常记录在language_model_error
+        :return: threading.Thread or None
+        """
         self.check_detector_initialized()
-        self.lm = kenlm.Model(path)
-        logger.info('Loaded language model: %s' % path)
 
-    def set_custom_confusion_dict(self, path):
+        def load():
+            try:
+                lm = get_language_model(path, self.language_model_load_method)
+            except Exception as e:
+                logger.error('load language model error, path: %s, %s' % (path, e))
+                self.language_model_error = e
+                if not background:
+                    raise
+                return
+            with self.dict_lock:
+                old_path = self.language_model_path
+                self.lm = lm
+                self.language_model_path = path
+                self.window_state_cache = {}
+                self.language_model_error = None
+                self.dict_version += 1
+            release_language_model(old_path, self.language_model_load_method)
+            logger.info('Loaded language model: %s' % path)
+
+        if not background:
+            load()
+            return None
+        thread = threading.Thread(target=load, name='load_language_model')
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def set_custom_confusion_dict(self, path, bundle=False):
+        """
+        加载自定义困惑集文件
+        :param path:
+        :param bundle: 是否编译进资源包，默认直接解析，临时加载的文件不留在资源包中
+        :return:
+        """
         self.check_detector_initialized()
-        custom_confusion = self._get_custom_confusion_dict(path)
-        self.custom_confusion.update(custom_confusion)
-        logger.info('Loaded confusion path: %s, size: %d' % (path, len(custom_confusion)))
+        if bundle:
+            confusion, origin_freq = self._load_resource('confusion', path, self.load_custom_confusion_dict)
+        else:
+            confusion, origin_freq = self.load_custom_confusion_dict(path)
+        self.update_confusions(add=confusion, origin_freq=origin_freq, add_to_tokenizer=False)
+        if bundle:
+            self._save_resource_bundle()
+        logger.info('Loaded confusion path: %s, size: %d' % (path, len(confusion)))
 
-    def set_custom_word(self, path):
+    def set_custom_word(self, path, bundle=False):
+        """
+        加载自定义词文件
+        :param path:
+        :param bundle: 是否编译进资源包，默认直接解析，临时加载的文件不留在资源包中
+        :return:
+        """
         self.check_detector_initialized()
-        word_freqs = self.load_word_freq_dict(path)
-        # 合并字典
-        self.custom_word_freq.update(word_freqs)
-        # 合并切词词典及自定义词典
-        self.word_freq.update(self.custom_word_freq)
-        self.tokenizer = Tokenizer(dict_path=self.word_freq_path, custom_word_freq_dict=self.custom_word_freq,
-                                   custom_confusion_dict=self.custom_confusion)
-        for k, v in word_freqs.items():
-            self.set_word_frequency(k, v)
+        if bundle:
+            word_freqs = self._load_resource('word_freq', path, self.load_word_freq_dict)
+        else:
+            word_freqs = self.load_word_freq_dict(path)
+        self.add_custom_words(word_freqs)
+        if bundle:
+            self._save_resource_bundle()
         logger.info('Loaded custom word path: %s, size: %d' % (path, len(word_freqs)))
 
+    def add_custom_words(self, word_freqs):
+        """
+        增量添加自定义词，在词典和切词器的副本上修改，dict_lock内只切换引用，不阻塞检测和纠错
+        :param word_freqs: dict, {word: freq}
+        :return:
+        """
+        self.check_detector_initialized()
+        with self.dict_update_lock:
+            custom_word_freq = dict(self.custom_word_freq)
+            shadowed_word_freq = dict(self.shadowed_word_freq)
+            word_freq = self.word_freq.copy()
+            tokenizer = self.tokenizer.copy()
+            for word, freq in word_freqs.items():
+                if word not in custom_word_freq and word in word_freq:
+                    shadowed_word_freq[word] = word_freq[word]
+                custom_word_freq[word] = freq
+                word_freq[word] = freq
+                tokenizer.add_word(word, freq)
+            prepared = self._prepare_word_freq_change(word_freqs, word_freq)
+            with self.dict_lock:
+                self.custom_word_freq = custom_word_freq
+                self.shadowed_word_freq = shadowed_word_freq
+                self.word_freq = word_freq
+                self.tokenizer = tokenizer
+                self._word_freq_changed(word_freqs, prepared)
+                self.dict_version += 1
+        logger.debug('Added custom words, size: %d' % len(word_freqs))
+
+    def remove_custom_words(self, words):
+        """
+        增量删除自定义词，不是自定义词的忽略；基础词频词典中有该词时恢复其词频，否则删除
+        :param words: iterable, 词列表
+        :return:
+        """
+        self.check_detector_initialized()
+        with self.dict_update_lock:
+            words = [word for word in dict.fromkeys(words) if word in self.custom_word_freq]
+            if not words:
+                return
+            custom_word_freq = dict(self.custom_word_freq)
+            shadowed_word_freq = dict(self.shadowed_word_freq)
+            word_freq = self.word_freq.copy()
+            tokenizer = self.tokenizer.copy()
+            for word in words:
+                del custom_word_freq[word]
+                if word in shadowed_word_freq:
+                    base_freq = shadowed_word_freq.pop(word)
+                    word_freq[word] = base_freq
+                    tokenizer.add_word(word, base_freq)
+                else:
+                    word_freq.pop(word, None)
+                    tokenizer.del_word(word)
+            prepared = self._prepare_word_freq_change(words, word_freq)
+            with self.dict_lock:
+                self.custom_word_freq = custom_word_freq
+                self.shadowed_word_freq = shadowed_word_freq
+                self.word_freq = word_freq
+                self.tokenizer = tokenizer
+                self._word_freq_changed(words, prepared)
+                self.dict_version += 1
+        logger.debug('Removed custom words, size: %d' % len(words))
+
+    def update_confusions(self, add=None, remove=None, origin_freq=None, add_to_tokenizer=True):
+        """
+        增量更新自定义混淆集，混淆集只构建差量的自动机，与词典副本一起在锁外构建，dict_lock内只切换引用
+        :param add: dict, {variant: origin}, 新增或修改的混淆词
+        :param remove: iterable, 删除的混淆词variant，切词器中保留这些词
+        :param origin_freq: dict, {origin: freq}, 本体词词频，并入词频词典，默认1
+        :param add_to_tokenizer: 是否把新增的混淆词和本体词加入切词器
+        :return:
+        """
+        self.check_detector_initialized()
+        add = add or {}
+        remove = list(remove or [])
+        if origin_freq is None:
+            origin_freq = {origin: 1 for origin in add.values()}
+        with self.dict_update_lock:
+            custom_confusion = self.custom_confusion.update(add=add, remove=remove)
+            word_freq = self.word_freq
+            if origin_freq:
+                word_freq = word_freq.copy()
+                word_freq.update(origin_freq)
+            tokenizer = self.tokenizer
+            if add_to_tokenizer and add:
+                tokenizer = tokenizer.copy()
+                for variant, origin in add.items():
+                    tokenizer.add_word(variant)
+                    tokenizer.add_word(origin)
+            prepared = self._prepare_word_freq_change(origin_freq, word_freq)
+            with self.dict_lock:
+                self.custom_confusion = custom_confusion
+                self.word_freq = word_freq
+                self.tokenizer = tokenizer
+                self._word_freq_changed(origin_freq, prepared)
+                self.dict_version += 1
+        logger.debug('Updated confusions, add: %d, remove: %d' % (len(add), len(remove)))
+
+    def _prepare_word_freq_change(self, words, word_freq):
+        """
+        word_freq中这些词增删前调用，不持有dict_lock，子类在此完成耗时的计算
+        :param words: iterable, 变化的词
+        :param word_freq: 修改后的词频词典
+        :return: 传给_word_freq_changed的prepared
+        """
+        return None
+
+    def _word_freq_changed(self, words, prepared=None):
+        """
+        word_freq中这些词增删后调用，子类据此更新由词典派生的索引，调用时持有dict_lock，只做轻量的修改
+        :param words: iterable, 变化的词
+        :param prepared: _prepare_word_freq_change的返回值
+        :return:
+        """
+        pass
+
     def enable_char_error(self, enable=True):
         """
         is open char error detect
@@ -165,6 +518,64 @@ class Detector(object):
         """
         self.is_word_error_detect = enable
 
+    def enable_fast_path(self, enable=True, threshold=None, max_oov=0):
+        """
+        is open fluent sentence fast path, 通顺的句子只做混淆集检测，不做切词未登录词和字窗口检测
+        :param enable:
+        :param threshold: 整句平均每字的log10概率阈值，不低于阈值视为通顺，
+                          需按语言模型校准，见pycorrector.eval.calibrate_fast_path
+        :param max_oov: 通顺句子允许的语言模型未登录字数
+        :return:
+        """
+        if enable and threshold is None:
+            raise ValueError('fast path threshold is required, see pycorrector.eval.calibrate_fast_path')
+        self.fast_path_threshold = threshold if enable else None
+        self.fast_path_max_oov = max_oov
+
+    def sentence_fluency(self, sentence):
+        """
+        整句通顺度，一次语言模型查询得到
+        :param sentence: 归一化后的句子
+        :return: (平均每字的log10概率，含句尾; 语言模型未登录字数)
+        """
+        self.check_detector_initialized()
+        chars = [char for char in sentence if char not in LM_WHITESPACE]
+        if not chars:
+            return 0.0, 0
+        total = 0.0
+        oov_count = 0
+        for prob, _, oov in self.lm.full_scores(' '.join(chars), bos=True, eos=True):
+            total += prob
+            oov_count += oov
+        return total / (len(chars) + 1), oov_count
+
+    def _is_fluent(self, sentence):
+        avg_score, oov_count = self.sentence_fluency(sentence)
+        return avg_score >= self.fast_path_threshold and oov_count <= self.fast_path_max_oov
+
+    def enable_result_cache(self, enable=True, maxsize=100000):
+        """
+        is open result cache, 重复的句子直接返回缓存结果
+        :param enable:
+        :param maxsize: 最大缓存句子数
+        :return:
+        """
+        self.detect_cache = LRUCache(maxsize) if enable else None
+
+    def result_cache_info(self):
+        """
+        结果缓存的命中、未命中和淘汰次数
+        :return: dict, {cache_name: info}
+        """
+        info = {}
+        if self.detect_cache is not None:
+            info['detect'] = self.detect_cache.info()
+        return info
+
+    def _result_cache_key(self, sentence):
+        return (sentence, self.dict_version, self.is_char_error_detect, self.is_word_error_detect,
+                self.fast_path_threshold, self.fast_path_max_oov)
+
     def ngram_score(self, chars):
         """
         取n元文法得分
@@ -174,6 +585,144 @@ class Detector(object):
         self.check_detector_initialized()
         return self.lm.score(' '.join(chars), bos=False, eos=False)
 
+    def char_window_scores(self, sentence, max_n=4):
+        """
+        单遍扫描取字窗口的n元文法得分
+        每个位置从空上下文出发，用kenlm.State逐字步进max_n次，同时得到以该位置开头的
+        1..max_n字窗口得分，与ngram_score(list(sentence[i:i + n]))结果一致；
+        窗口前缀的状态有缓存，常见的字组合不再重复查询语言模型
+        :param sentence: 句子文本
+        :param max_n: 最大窗口长度
+        :return: np.array, shape=(len(sentence), max_n), [i, n - 1]为sentence[i:i + n]的得分
+        """
+        self.check_detector_initialized()
+        if len(self.window_state_cache) > self.window_state_cache_size:
+            self.window_state_cache = {}
+        cache = self.window_state_cache
+        base_score = self.lm.BaseScore
+        null_state = kenlm.State()
+        self.lm.NullContextWrite(null_state)
+        sentence_len = len(sentence)
+        rows = []
+        for i in range(sentence_len):
+            row = [0.0] * max_n
+            state = null_state
+            for k in range(min(max_n, sentence_len - i)):
+                key = sentence[i:i + k + 1]
+                item = cache.get(key)
+                if item is None:
+                    char = key[-1]
+                    if char in LM_WHITESPACE:
+                        item = (0.0, state)
+                    else:
+                        out_state = kenlm.State()
+                        item = (base_score(state, char, out_state), out_state)
+                    cache[key] = item
+                row[k] = item[0]
+                state = item[1]
+            rows.append(row)
+        # kenlm以float累加得分，按float32累加保证与lm.score结果一致
+        steps = np.array(rows, dtype=np.float32).reshape(sentence_len, max_n)
+        return np.cumsum(steps, axis=1, dtype=np.float32)
+
+    def _lm_prefix_states(self, tokens):
+        """
+        从句首逐字步进，取每个前缀之后的kenlm状态和累计得分，与上次调用的公共前缀部分直接复用
+        :param tokens: list, 不含空白符的字
+        :return: (list of kenlm.State, list of np.float32)，长度均为len(tokens) + 1
+        """
+        lm, cached_tokens, states, totals = self.lm_prefix_cache
+        if lm is not self.lm:
+            state = kenlm.State()
+            self.lm.BeginSentenceWrite(state)
+            cached_tokens, states, totals = [], [state], [np.float32(0.0)]
+        common = 0
+        limit = min(len(cached_tokens), len(tokens))
+        while common < limit and cached_tokens[common] == tokens[common]:
+            common += 1
+        if common < len(tokens):
+            cached_tokens = cached_tokens[:common] + tokens[common:]
+            states = states[:common + 1]
+            totals = totals[:common + 1]
+            for token in tokens[common:]:
+                out_state = kenlm.State()
+                # kenlm以float累加得分
+                totals.append(totals[-1] + np.float32(self.lm.BaseScore(states[-1], token, out_state)))
+                states.append(out_state)
+            self.lm_prefix_cache = (self.lm, cached_tokens, states, totals)
+        return states[:len(tokens) + 1], totals[:len(tokens) + 1]
+
+    def ppl_scores_in_context(self, items, before_sent, after_sent):
+        """
+        批量取 ppl_score(before_sent + item + after_sent)，结果与逐句计算一致
+        左侧上下文的kenlm状态有缓存；各候选只对自身及其后的字打分，直到kenlm状态与参照句
+        （第一个候选）在同一位置的状态相同（最多order - 1个字），其后各字得分与参照句相同直接复用；
+        有公共前缀的候选共享该前缀的状态计算
+        :param items: list, 候选词，第一个作为参照
+        :param before_sent: 左侧上下文
+        :param after_sent: 右侧上下文
+        :return: list, 各候选的困惑度
+        """
+        self.check_detector_initialized()
+        base_score = self.lm.BaseScore
+        before_tokens = [char for char in before_sent if char not in LM_WHITESPACE]
+        after_tokens = [char for char in after_sent if char not in LM_WHITESPACE]
+        prefix_states, prefix_totals = self._lm_prefix_states(before_tokens)
+        # 候选前缀 => (之后的kenlm状态, 各字得分)
+        walked = {'': (prefix_states[-1], ())}
+
+        def walk(text):
+            item = walked.get(text)
+            if item is None:
+                k = len(text) - 1
+                while text[:k] not in walked:
+                    k -= 1
+                state, probs = walked[text[:k]]
+                for k in range(k, len(text)):
+                    out_state = kenlm.State()
+                    probs = probs + (base_score(state, text[k], out_state),)
+                    state = out_state
+                    walked[text[:k + 1]] = (state, probs)
+                item = (state, probs)
+            return item
+
+        # 参照句右侧上下文每个位置之前的状态和各字得分，最后一项为句尾
+        ref_state, _ = walk(''.join(char for char in items[0] if char not in LM_WHITESPACE))
+        ref_states = [ref_state]
+        ref_probs = []
+        for token in after_tokens + ['</s>']:
+            out_state = kenlm.State()
+            ref_probs.append(base_score(ref_states[-1], token, out_state))
+            ref_states.append(out_state)
+        ref_probs = np.array(ref_probs, dtype=np.float32)
+
+        # 各候选的得分序列：左侧上下文累计得分、候选附近窗口内各字得分、复用的参照句得分，行尾补0
+        rows = []
+        token_counts = []
+        for item in items:
+            item_tokens = ''.join(char for char in item if char not in LM_WHITESPACE)
+            state, probs = walk(item_tokens)
+            probs = list(probs)
+            j = 0
+            while j <= len(after_tokens) and state != ref_states[j]:
+                token = after_tokens[j] if j < len(after_tokens) else '</s>'
+                out_state = kenlm.State()
+                probs.append(base_score(state, token, out_state))
+                state = out_state
+                j += 1
+            rows.append((probs, j))
+            token_counts.append(len(before_tokens) + len(item_tokens) + len(after_tokens))
+        width = 1 + max(len(probs) + len(ref_probs) - j for probs, j in rows)
+        matrix = np.zeros((len(rows), width), dtype=np.float32)
+        matrix[:, 0] = prefix_totals[-1]
+        for row, (probs, j) in enumerate(rows):
+            matrix[row, 1:len(probs) + 1] = probs
+            matrix[row, len(probs) + 1:len(probs) + 1 + len(ref_probs) - j] = ref_probs[j:]
+        # 按kenlm的累加顺序以float32逐个相加，补的0不改变结果
+        totals = np.cumsum(matrix, axis=1, dtype=np.float32)[:, -1]
+        scores = [10.0 ** (-float(total) / (token_count + 1)) for total, token_count in zip(totals, token_counts)]
+        return scores
+
     def ppl_score(self, words):
         """
         取语言模型困惑度得分，越小句子越通顺
@@ -197,70 +746,158 @@ class Detector(object):
         更新在样本中的词频
         """
         self.check_detector_initialized()
-        self.word_freq[word] = num
+        with self.dict_update_lock:
+            # 修改后word在词典中
+            prepared = self._prepare_word_freq_change([word], {word: num})
+            with self.dict_lock:
+                self.word_freq[word] = num
+                self._word_freq_changed([word], prepared)
+                self.dict_version += 1
         return self.word_freq
 
-    @staticmethod
-    def _check_contain_error(maybe_err, maybe_errors):
+    def prepare_fork(self):
         """
-        检测错误集合(maybe_errors)是否已经包含该错误位置（maybe_err)
-        :param maybe_err: [error_word, begin_pos, end_pos, error_type]
-        :param maybe_errors:
+        fork子进程前加载全部模型和词典，子进程直接共享这些内存页
         :return:
         """
-        error_word_idx = 0
-        begin_idx = 1
-        end_idx = 2
-        for err in maybe_errors:
-            if maybe_err[error_word_idx] in err[error_word_idx] and maybe_err[begin_idx] >= err[begin_idx] and \
-                    maybe_err[end_idx] <= err[end_idx]:
-                return True
-        return False
+        self.check_detector_initialized()
+        self.tokenizer.initialize()
 
-    def _add_maybe_error_item(self, maybe_err, maybe_errors):
+    def _run_batch(self, method_name, sentences, n_jobs=None, chunksize=None):
         """
-        新增错误
-        :param maybe_err:
-        :param maybe_errors:
-        :return:
+        多进程批量处理，先在父进程加载资源，再fork子进程，结果与输入顺序一致
+        :param method_name: 批量处理一组句子的方法名，如'_detect_sentences'
+        :param sentences: list, 句子列表
+        :param n_jobs: 进程数，None或<=0时取CPU核数，1则在当前进程串行处理
+        :param chunksize: 每次交给method_name处理的句子数，None时按进程数自动计算
+        :return: list
+        """
+        global _forked_detector, _forked_method
+        sentences = list(sentences)
+        if not sentences:
+            return []
+        if n_jobs is None or n_jobs <= 0:
+            n_jobs = os.cpu_count() or 1
+        n_jobs = max(min(n_jobs, len(sentences)), 1)
+        if not chunksize:
+            chunksize, extra = divmod(len(sentences), n_jobs * 4)
+            chunksize = min(chunksize + (1 if extra else 0), 1024)
+        chunks = [sentences[i:i + chunksize] for i in range(0, len(sentences), chunksize)]
+        if n_jobs <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            results = [getattr(self, method_name)(chunk) for chunk in chunks]
+        else:
+            self.prepare_fork()
+            _forked_detector, _forked_method = self, method_name
+            try:
+                with multiprocessing.get_context('fork').Pool(n_jobs) as pool:
+                    results = pool.map(_call_forked_method, chunks, chunksize=1)
+            finally:
+                _forked_detector, _forked_method = None, ''
+        return [item for chunk_result in results for item in chunk_result]
+
+    def detect_batch(self, sentences, n_jobs=None, chunksize=None):
+        """
+        批量检测句子中的疑似错误信息
+        :param sentences: list, 句子列表
+        :param n_jobs: 进程数，None时取CPU核数
+        :param chunksize: 每次分发给子进程的句子数
+        :return: list, 与输入顺序一致的detect结果
         """
-        if maybe_err not in maybe_errors and not self._check_contain_error(maybe_err, maybe_errors):
-            maybe_errors.append(maybe_err)
+        return self._run_batch('_detect_sentences', sentences, n_jobs=n_jobs, chunksize=chunksize)
 
     @staticmethod
     def _get_maybe_error_index(scores, ratio=0.6745, threshold=1.4):
         """
         取疑似错字的位置，通过平均绝对离差（MAD）
-        :param scores: np.array
+        :param scores: np.array, 一句中各字的得分
         :param threshold: 阈值越小，得到疑似错别字越多
-        :return:
+        :return: list
+        """
+        scores = np.asarray(scores, dtype=float).reshape(1, -1)
+        lengths = np.array([scores.shape[1]], dtype=np.int64)
+        return Detector._get_maybe_error_index_batch(scores, lengths, ratio=ratio, threshold=threshold)[0]
+
+    @staticmethod
+    def _get_sent_scores_batch(window_scores_list, orders=(2, 3, 4)):
+        """
+        批量计算句子每个字的ngram滑窗平均得分
+        等价于逐句对每个n补全首尾窗口得分后做长度为n的滑动平均（与全1卷积核做卷积），
+        再对各n取平均；按原实现的累加顺序逐个平移相加，保证与逐句计算的浮点结果一致
+        :param window_scores_list: list of np.array, 每句的char_window_scores结果
+        :param orders: 参与平均的ngram阶数
+        :return: (np.array, shape=(句子数, 最大句长)的得分矩阵, 超出句长处为nan; np.array, 句长)
         """
-        # TODO: DEBUG
-        # print("取疑似错字的位置 (_get_maybe_error_index)：")
+        lengths = np.array([len(window_scores) for window_scores in window_scores_list], dtype=np.int64)
+        batch_size = len(window_scores_list)
+        max_len = int(lengths.max()) if batch_size else 0
+        if max_len == 0:
+            return np.zeros((batch_size, 0)), lengths
+        max_order = max(orders)
+        windows = np.zeros((batch_size, max_len, max_order))
+        for row, window_scores in enumerate(window_scores_list):
+            windows[row, :len(window_scores), :window_scores.shape[1]] = window_scores
+        positions = np.arange(max_len)
+        valid = positions[None, :] < lengths[:, None]
+        total = np.zeros((batch_size, max_len))
+        counts = np.zeros(batch_size)
+        for n in orders:
+            has_order = lengths >= n
+            # 补全后第j个得分取自第clip(j - n + 1, 0, len - n)个窗口
+            last_window = np.maximum(lengths - n, 0)
+            padded_positions = np.arange(max_len + n - 1)
+            source = np.clip(padded_positions[None, :] - (n - 1), 0, last_window[:, None])
+            padded = np.take_along_axis(windows[:, :, n - 1], source, axis=1)
+            window_sum = padded[:, :max_len].copy()
+            for k in range(1, n):
+                window_sum += padded[:, k:k + max_len]
+            avg_scores = window_sum / n
+            total += np.where(has_order[:, None] & valid, avg_scores, 0.0)
+            counts += has_order
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sent_scores = total / counts[:, None]
+        sent_scores[~valid | (counts[:, None] == 0)] = np.nan
+        return sent_scores, lengths
 
-        scores = np.array(scores)
-        if len(scores.shape) == 1:
-            scores = scores[:, None]
-        median = np.median(scores, axis=0)  # get median of all scores
-        margin_median = np.sqrt(np.sum((scores - median) ** 2, axis=-1))  # deviation from the median
+    @staticmethod
+    def _masked_median(values, lengths):
+        """
+        按行取前lengths[i]个元素的中位数（超出部分为nan，排序后位于行尾）
+        :param values: np.array, shape=(batch_size, max_len)
+        :param lengths: np.array, 各行有效长度，须大于0
+        :return: np.array, shape=(batch_size,)
+        """
+        sorted_values = np.sort(values, axis=1)
+        rows = np.arange(len(lengths))
+        low = sorted_values[rows, (lengths - 1) // 2]
+        high = sorted_values[rows, lengths // 2]
+        return (low + high) / 2
+
+    @staticmethod
+    def _get_maybe_error_index_batch(scores, lengths, ratio=0.6745, threshold=1.4):
+        """
+        批量取疑似错字的位置，通过平均绝对离差（MAD），各行分别计算中位数和离差
+        :param scores: np.array, shape=(batch_size, max_len)，超出句长处为nan
+        :param lengths: np.array, 各行句长
+        :param threshold: 阈值越小，得到疑似错别字越多
+        :return: list of list, 每句的疑似错字index
+        """
+        result = [[] for _ in range(len(lengths))]
+        rows = np.where(lengths > 0)[0]
+        if not len(rows):
+            return result
+        scores = scores[rows]
+        lengths = lengths[rows]
+        valid = np.arange(scores.shape[1])[None, :] < lengths[:, None]
+        median = Detector._masked_median(scores, lengths)[:, None]
+        margin_median = np.sqrt((scores - median) ** 2)
         # 平均绝对离差值
-        med_abs_deviation = np.median(margin_median)
-        # print(" median={}".format(median))
-        # print(" margin_median={}".format(margin_median))
-        # print(" med_abs_deviation={}".format(med_abs_deviation))
-        if med_abs_deviation == 0:
-            return []
-        y_score = ratio * margin_median / med_abs_deviation
-        # 打平
-        scores = scores.flatten()
-        # print(" threshold={}".format(threshold))
-        # print(" y_score={}".format(str(y_score)))
-        # print(" median={}".format(median))
-        # print(" scores={}".format(str(scores)))
-
-        maybe_error_indices = np.where((y_score > threshold) & (scores < median))
-        # 取全部疑似错误字的index
-        return list(maybe_error_indices[0])
+        med_abs_deviation = Detector._masked_median(margin_median, lengths)[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            y_score = ratio * margin_median / med_abs_deviation
+            is_error = (y_score > threshold) & (scores < median) & valid & (med_abs_deviation != 0)
+        for row, col in zip(*np.where(is_error)):
+            result[rows[row]].append(col)
+        return result
 
     def detect(self, sentence):
         """
@@ -268,83 +905,104 @@ class Detector(object):
         :param sentence:
         :return: [error_word, begin_pos, end_pos, error_type]
         """
-        # print("Detect process")
-        maybe_errors = []
-        if not sentence.strip():
-            return maybe_errors
-        self.check_detector_initialized()
-        # 文本归一化
-        sentence = uniform(sentence)
-        # TODO: DEBUG
-        # print("文本归一化：「{}」".format(sentence))
-        # 切词
-        tokens = self.tokenizer.tokenize(sentence)
-        # print("切词：「{}」".format(tokens))
-        # print(tokens)
-        # 自定义混淆集加入疑似错误词典
-        for confuse in self.custom_confusion:
-            idx = sentence.find(confuse)
-            if idx > -1:
-                maybe_err = [confuse, idx, idx + len(confuse), error_type["confusion"]]
-                self._add_maybe_error_item(maybe_err, maybe_errors)
-
-        if self.is_word_error_detect:
-            # 未登录词加入疑似错误词典
-            # print("未登录词加入疑似错误词典:")
-            for word, begin_idx, end_idx in tokens:
-                # pass blank
-                if not word.strip():
-                    continue
-                # punctuation
-                if word in PUNCTUATION_LIST:
-                    continue
-                # pass num
-                if word.isdigit():
-                    continue
-                # pass alpha
-                if is_alphabet_string(word.lower()):
-                    continue
-                # in dict
-                if word in self.word_freq:
-                    continue
-                maybe_err = [word, begin_idx, end_idx, error_type["word"]]
-                self._add_maybe_error_item(maybe_err, maybe_errors)
-                # print(" 疑似词：{}".format(maybe_errors))
-        if self.is_char_error_detect:
-            # 语言模型检测疑似错误字
-            # TODO: DEBUG
-            # print("语言模型检测疑似错误字(划窗@char level):")
-            ngram_avg_scores = []
-            try:
-                for n in [2, 3, 4]:
-                    scores = []
-                    for i in range(len(sentence) - n + 1):
-                        word = sentence[i:i + n]
-                        score = self.ngram_score(list(word))
-                        scores.append(score)
-                    if not scores:
+        return self._detect_sentences([sentence])[0]
+
+    def _detect_sentences(self, sentences):
+        """
+        批量检测句子中的疑似错误信息，开启结果缓存时只检测未命中的句子
+        :param sentences: list, 句子列表
+        :return: list, 每句的[error_word, begin_pos, end_pos, error_type]列表
+        """
+        with self.dict_lock:
+            return self._detect_sentences_cached(sentences)
+
+    def _detect_sentences_cached(self, sentences):
+        cache = self.detect_cache
+        if cache is None:
+            return self._detect_sentences_uncached(sentences)
+        results = []
+        miss_indices = []
+        miss_keys = []
+        for i, sentence in enumerate(sentences):
+            key = self._result_cache_key(uniform(sentence))
+            maybe_errors = cache.get(key)
+            if maybe_errors is None:
+                miss_indices.append(i)
+                miss_keys.append(key)
+            results.append(maybe_errors)
+        if miss_indices:
+            miss_results = self._detect_sentences_uncached([sentences[i] for i in miss_indices])
+            for i, key, maybe_errors in zip(miss_indices, miss_keys, miss_results):
+                cache.put(key, maybe_errors)
+                results[i] = maybe_errors
+        # 返回副本，避免调用方修改缓存内容
+        return [[list(maybe_err) for maybe_err in maybe_errors] for maybe_errors in results]
+
+    def _detect_sentences_uncached(self, sentences):
+        """
+        批量检测句子中的疑似错误信息，字粒度的滑窗平均和MAD离群检测在整批句子上向量化计算
+        :param sentences: list, 句子列表
+        :return: list, 每句的[error_word, begin_pos, end_pos, error_type]列表
+        """
+        batch_errors = []
+        batch_sentences = []
+        for sentence in sentences:
+            maybe_errors = ErrorSpanIndex()
+            batch_errors.append(maybe_errors)
+            if not sentence.strip():
+                batch_sentences.append('')
+                continue
+            self.check_detector_initialized()
+            # 文本归一化
+            sentence = uniform(sentence)
+            # 自定义混淆集加入疑似错误词典
+            for confuse, begin_idx, end_idx in self.custom_confusion.find_all(sentence):
+                maybe_errors.add(confuse, begin_idx, end_idx, error_type["confusion"])
+            # 通顺的句子跳过切词和字窗口检测
+            if self.fast_path_threshold is not None and self._is_fluent(sentence):
+                batch_sentences.append('')
+                continue
+            batch_sentences.append(sentence)
+
+            if self.is_word_error_detect:
+                # 切词
+                tokens = self.tokenizer.tokenize(sentence)
+                # 未登录词加入疑似错误词典
+                for word, begin_idx, end_idx in tokens:
+                    # pass blank
+                    if not word.strip():
                         continue
-                    # 移动窗口补全得分
-                    for _ in range(n - 1):
-                        scores.insert(0, scores[0])
-                        scores.append(scores[-1])
-                    avg_scores = [sum(scores[i:i + n]) / len(scores[i:i + n]) for i in range(len(sentence))]
-
-                    ngram_avg_scores.append(avg_scores)
-
-                # 取拼接后的ngram平均得分
-                # TODO:DEBUG
-                # print(" ngram_avg_scores={}".format(ngram_avg_scores))
-                sent_scores = list(np.average(np.array(ngram_avg_scores), axis=0))
-                # print(" (拼接后的ngram平均得分)sent_scores={}".format(sent_scores))
-                # 取疑似错字信息
-                for i in self._get_maybe_error_index(sent_scores):
-                    maybe_err = [sentence[i], i, i + 1, error_type["char"]]
-                    # print(" 疑似错字位置：{}".format(maybe_err))
-                    # print("语言模型检测错字：{}".format(i))
-                    self._add_maybe_error_item(maybe_err, maybe_errors)
-            except IndexError as ie:
-                logger.warn("index error, sentence:" + sentence + str(ie))
-            except Exception as e:
-                logger.warn("detect error, sentence:" + sentence + str(e))
-        return sorted(maybe_errors, key=lambda k: k[1], reverse=False)
+                    # punctuation
+                    if word in PUNCTUATION_LIST:
+                        continue
+                    # pass num
+                    if word.isdigit():
+                        continue
+                    # pass alpha
+                    if is_alphabet_string(word.lower()):
+                        continue
+                    # in dict
+                    if word in self.word_freq:
+                        continue
+                    maybe_errors.add(word, begin_idx, end_idx, error_type["word"])
+        if self.is_char_error_detect:
+            # 语言模型检测疑似错误字(划窗@char level)
+            window_scores_list = []
+            for sentence in batch_sentences:
+                try:
+                    window_scores = self.char_window_scores(sentence, max_n=4) if sentence else None
+                except Exception as e:
+                    logger.warn("detect error, sentence:" + sentence + str(e))
+                    window_scores = None
+                # 单字句子没有可用的ngram得分
+                if window_scores is None or len(window_scores) < 2:
+                    window_scores = np.zeros((0, 4))
+                window_scores_list.append(window_scores)
+            # 取拼接后的ngram平均得分
+            sent_scores, lengths = self._get_sent_scores_batch(window_scores_list)
+            # 取疑似错字信息
+            maybe_error_indices = self._get_maybe_error_index_batch(sent_scores, lengths)
+            for sentence, maybe_errors, indices in zip(batch_sentences, batch_errors, maybe_error_indices):
+                for i in indices:
+                    maybe_errors.add(sentence[i], i, i + 1, error_type["char"])
+        return [maybe_errors.to_list() for maybe_errors in batch_errors]
@@ -2,9 +2,24 @@
 # Author: XuMing <xuming624@qq.com>
 # Brief: english correction
 # refer to http://norvig.com/spell-correct.html
-import re
+import hashlib
 import os
+import re
+import threading
 from collections import Counter
+from collections.abc import Mapping
+
+from pycorrector.config import en_spell_index_path, en_spell_table_dir
+from pycorrector.utils.bundle import get_resource_bundle, file_signature
+from pycorrector.utils.io_utils import get_logger
+from pycorrector.utils.string_table import StringTable
+from pycorrector.utils.symspell import DeleteIndex
+
+logger = get_logger(__file__)
+
+letters = 'abcdefghijklmnopqrstuvwxyz'
+# 只纠正纯英文字母的词
+ascii_word_re = re.compile(r'[A-Za-z]+')
 
 
 def words(text):
@@ -13,17 +28,147 @@ def words(text):
 
 pwd_path = os.path.abspath(os.path.dirname(__file__))
 path = os.path.join(pwd_path, 'data/en/big.txt')
-WORDS = Counter(words(open(path).read()))
+# 词频表文件目录，语料的词频表不存在时统计后写入，之后直接读表，不必重新统计语料；为空则每次统计语料
+table_dir = en_spell_table_dir
+# 词频表在首次使用时才加载，导入本模块不读盘
+_words = None
+_total = None
+_words_lock = threading.Lock()
+# 删除变体索引，为None时逐个枚举编辑生成候选词
+_delete_index = None
+_index_path = None
+
+
+def count_words(corpus_path):
+    """
+    逐行统计语料词频，不把整个语料读入内存
+    :param corpus_path:
+    :return: Counter
+    """
+    word_counts = Counter()
+    with open(corpus_path) as f:
+        for line in f:
+            word_counts.update(words(line))
+    return word_counts
+
+
+def words_table_path(corpus_path):
+    """
+    语料的词频表文件路径，由语料路径、大小和修改时间决定，语料变化则生成新表
+    :param corpus_path:
+    :return:
+    """
+    key = repr((corpus_path, file_signature(corpus_path)))
+    return os.path.join(table_dir, 'en_words_%s.table' % hashlib.md5(key.encode('utf-8')).hexdigest())
+
+
+def build_words_table(corpus_path=path, table_path=''):
+    """
+    统计语料词频并生成词频表文件，可在部署时预先执行
+    :param corpus_path:
+    :param table_path: 为空则取words_table_path(corpus_path)
+    :return: table_path
+    """
+    table_path = table_path or words_table_path(corpus_path)
+    StringTable.build(count_words(corpus_path), table_path)
+    return table_path
 
 
-def P(word, N=sum(WORDS.values())):
+def get_words():
+    """
+    word count of the corpus, loaded on first use
+    词频表只作为存储格式，读入Counter后查询，候选词判断不必逐次在表中探查
+    :return: Counter
+    """
+    global _words, _total
+    if _words is None:
+        with _words_lock:
+            if _words is None:
+                table_path = words_table_path(path) if table_dir else ''
+                if table_path and not os.path.exists(table_path):
+                    try:
+                        build_words_table(path, table_path)
+                    except OSError as e:
+                        logger.warn('build words table error, path: %s, %s' % (table_path, e))
+                        table_path = ''
+                if table_path:
+                    word_counts = Counter(StringTable(table_path).to_dict())
+                else:
+                    word_counts = count_words(path)
+                _total = sum(word_counts.values())
+                _words = word_counts
+    return _words
+
+
+class _LazyWords(Mapping):
+    """
+    兼容 en_spell.WORDS，首次使用时才加载词频
+    """
+
+    def __getitem__(self, word):
+        return get_words()[word]
+
+    def __contains__(self, word):
+        return word in get_words()
+
+    def __len__(self):
+        return len(get_words())
+
+    def __iter__(self):
+        return iter(get_words())
+
+    def __getattr__(self, name):
+        # most_common等Counter的方法
+        return getattr(get_words(), name)
+
+
+WORDS = _LazyWords()
+
+
+def P(word, N=None):
     """
     probability of word
     :param word:
-    :param N:
+    :param N: total word count, default is the corpus size
     :return:
     """
-    return WORDS[word] / N
+    word_counts = get_words()
+    return word_counts[word] / (N or _total)
+
+
+def enable_symspell(enable=True, index_path=en_spell_index_path):
+    """
+    is open symspell, 用删除变体索引生成候选词，结果与逐个枚举编辑一致
+    :param enable:
+    :param index_path: 索引缓存文件，语料文件变化时重建，为空则不缓存
+    :return:
+    """
+    global _delete_index, _index_path
+    with _words_lock:
+        _delete_index = None
+        _index_path = index_path if enable else None
+    if enable:
+        get_delete_index()
+
+
+def get_delete_index():
+    """
+    删除变体索引，未开启时为None
+    :return: DeleteIndex
+    """
+    global _delete_index
+    if _delete_index is None and _index_path is not None:
+        word_counts = get_words()
+        with _words_lock:
+            if _delete_index is None and _index_path is not None:
+                if _index_path:
+                    bundle = get_resource_bundle(_index_path)
+                    index = bundle.get('en_delete_index', (path,), lambda: DeleteIndex(word_counts, 2))
+                    bundle.save()
+                else:
+                    index = DeleteIndex(word_counts, 2)
+                _delete_index = index
+    return _delete_index
 
 
 def correction(word):
@@ -32,7 +177,8 @@ def correction(word):
     :param word:
     :return:
     """
-    return max(candidates(word), key=P)
+    # 候选词排序后再取最大，概率相同时结果与候选集的生成方式无关
+    return max(sorted(candidates(word)), key=P)
 
 
 def candidates(word):
@@ -41,7 +187,63 @@ def candidates(word):
     :param word:
     :return:
     """
-    return known([word]) or known(edits1(word)) or known(edits2(word)) or [word]
+    return known([word]) or known_edits1(word) or known_edits2(word) or [word]
+
+
+def correct_text(text):
+    """
+    英文文本纠错
+    :param text:
+    :return: 改正后的文本, list(wrong, right, begin_idx, end_idx)
+    """
+    return correct_batch([text])[0]
+
+
+def correct_batch(texts):
+    """
+    批量英文文本纠错，各文本只切词一次，不在词典中的词去重后每个只纠正一次
+    只纠正纯英文字母的词，改正后保持原词的大小写形式
+    :param texts: list
+    :return: list, 与输入顺序一致的(改正后的文本, list(wrong, right, begin_idx, end_idx))
+    """
+    word_counts = get_words()
+    tokens = [[m for m in re.finditer(r'\w+', text) if ascii_word_re.fullmatch(m.group())]
+              for text in texts]
+    corrections = {}
+    for text_tokens in tokens:
+        for m in text_tokens:
+            word = m.group().lower()
+            if word not in corrections and word not in word_counts:
+                corrections[word] = correction(word)
+    results = []
+    for text, text_tokens in zip(texts, tokens):
+        pieces = []
+        detail = []
+        last_end_idx = 0
+        for m in text_tokens:
+            token = m.group()
+            right = corrections.get(token.lower())
+            if right is None or right == token.lower():
+                continue
+            right = _restore_case(token, right)
+            pieces.append(text[last_end_idx:m.start()])
+            pieces.append(right)
+            last_end_idx = m.end()
+            detail.append([token, right, m.start(), m.end()])
+        pieces.append(text[last_end_idx:])
+        results.append((''.join(pieces), detail))
+    return results
+
+
+def _restore_case(token, word):
+    """
+    按原词的大小写形式（全大写、首字母大写）改写纠正后的词
+    """
+    if len(token) > 1 and token.isupper():
+        return word.upper()
+    if token[0].isupper():
+        return word[0].upper() + word[1:]
+    return word
 
 
 def known(words):
@@ -50,7 +252,61 @@ def known(words):
     :param words:
     :return:
     """
-    return set(w for w in words if w in WORDS)
+    word_counts = get_words()
+    return set(w for w in words if w in word_counts)
+
+
+def known_edits1(word):
+    """
+    the subset of edits1(word) that appear in the dictionary of WORDS
+    :param word:
+    :return: set
+    """
+    index = get_delete_index()
+    if index is None:
+        return known(edits1(word))
+    edits = edits1(word)
+    return set(w for w in index.lookup(word, 1) if w in edits)
+
+
+def known_edits2(word):
+    """
+    the subset of edits2(word) that appear in the dictionary of WORDS
+    :param word:
+    :return: set
+    """
+    index = get_delete_index()
+    if index is None:
+        return known(edits2(word))
+    edits = edits1(word)
+    # edits1(word)中的字符只能来自word和letters
+    alphabet = set(letters) | set(word)
+    word_chars = Counter(word)
+    result = set()
+    for w in index.lookup(word, 2):
+        # 两次编辑至多删去两个字符、加入两个字符，先按字符计数粗筛
+        w_chars = Counter(w)
+        if sum((word_chars - w_chars).values()) > 2 or sum((w_chars - word_chars).values()) > 2:
+            continue
+        if not edits.isdisjoint(reverse_edits1(w, alphabet)):
+            result.add(w)
+    return result
+
+
+def reverse_edits1(word, alphabet):
+    """
+    all strings (with chars in alphabet) that have 'word' in their edits1
+    :param word:
+    :param alphabet: chars to insert or replace with
+    :return: set
+    """
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    # edits1的删除、交换、替换（为letters中的字）、插入（letters中的字）分别对应插入、交换、替换、删除
+    inserts = [L + c + R for L, R in splits for c in alphabet]
+    transposes = [L + R[1] + R[0] + R[2:] for L, R in splits if len(R) > 1]
+    replaces = [L + c + R[1:] for L, R in splits if R and R[0] in letters for c in alphabet]
+    deletes = [L + R[1:] for L, R in splits if R and R[0] in letters]
+    return set(inserts + transposes + replaces + deletes)
 
 
 def edits1(word):
@@ -59,7 +315,6 @@ def edits1(word):
     :param word:
     :return:
     """
-    letters = 'abcdefghijklmnopqrstuvwxyz'
     splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
     deletes = [L + R[1:] for L, R in splits if R]
     transposes = [L + R[1] + R[0] + R[2:] for L, R in splits if len(R) > 1]
@@ -82,8 +337,8 @@ if __name__ == '__main__':
     print(c1)
     c2 = correction('gorrect')
     print(c2)
-    comm = WORDS.most_common(10)
+    comm = get_words().most_common(10)
     print(comm)
-    max_word = max(WORDS, key=P)
+    max_word = max(get_words(), key=P)
     print(max_word)
     print(P('speling'))
@@ -2,10 +2,15 @@
 # Author: XuMing <xuming624@qq.com>
 # Brief:
 import re
+import time
 from codecs import open
+
+import numpy as np
+
 from pycorrector import correct
 from pycorrector.utils.io_utils import load_pkl
 from pycorrector.utils.math_utils import find_all_idx
+from pycorrector.utils.text_utils import uniform
 
 
 def get_bcmi_corpus(line, left_symbol='（（', right_symbol='））'):
@@ -82,6 +87,105 @@ def eval_sighan_corpus(pkl_path, verbose=False):
     return right_count / total_count, right_result, wrong_result
 
 
+def get_sighan_right_sentence(error_sentence, right_detail):
+    """
+    按标注的改正结果还原正确句子
+    :param error_sentence: 错误句子
+    :param right_detail: list, [(位置(从1开始), 错误词, 正确词)]
+    :return: 正确句子
+    """
+    chars = list(error_sentence)
+    for pos, wrong, right in right_detail:
+        begin_idx = error_sentence.find(wrong, max(pos - len(wrong), 0))
+        if begin_idx < 0 or len(wrong) != len(right):
+            continue
+        for i, (wrong_char, right_char) in enumerate(zip(wrong, right)):
+            if wrong_char != right_char:
+                chars[begin_idx + i] = right_char
+    return ''.join(chars)
+
+
+def _detect_error_positions(detector, sentences, right_details):
+    """
+    检测结果覆盖的标注错误位置数
+    """
+    hit_count = 0
+    for sentence, right_detail in zip(sentences, right_details):
+        maybe_errors = detector.detect(sentence)
+        for pos in set(pos for pos, _, _ in right_detail):
+            if any(begin_idx <= pos - 1 < end_idx for _, begin_idx, end_idx, _ in maybe_errors):
+                hit_count += 1
+    return hit_count
+
+
+def calibrate_fast_path(pkl_path, detector=None, max_recall_loss=0.02, max_oov=0, verbose=False):
+    """
+    在sighan数据上校准通顺句子快速通道的阈值
+    有错句子为原句，通顺句子为按标注改正后的句子；取使有错句子被快速通道跳过的比例不超过max_recall_loss的最低阈值，
+    并对比开启前后的检测吞吐量和错误位置召回
+    :param pkl_path: sighan数据，[(错误句子, [(位置, 错误词, 正确词)])]
+    :param detector: Detector，默认为pycorrector.corrector
+    :param max_recall_loss: 允许被跳过的有错句子比例
+    :param max_oov: 通顺句子允许的语言模型未登录字数
+    :param verbose:
+    :return: dict, 阈值及评估结果
+    """
+    if detector is None:
+        from pycorrector import corrector as detector
+    sighan_data = load_pkl(pkl_path)
+    error_sentences = [error_sentence for error_sentence, right_detail in sighan_data if right_detail]
+    right_details = [right_detail for _, right_detail in sighan_data if right_detail]
+    right_sentences = [get_sighan_right_sentence(error_sentence, right_detail)
+                       for error_sentence, right_detail in sighan_data]
+
+    error_fluency = [detector.sentence_fluency(uniform(sentence)) for sentence in error_sentences]
+    right_fluency = [detector.sentence_fluency(uniform(sentence)) for sentence in right_sentences]
+    # 未登录字数满足条件的有错句子按得分从高到低排序，得分不低于阈值的会被跳过
+    candidate_scores = sorted((score for score, oov_count in error_fluency if oov_count <= max_oov), reverse=True)
+    max_skip_count = int(max_recall_loss * len(error_sentences))
+    if len(candidate_scores) <= max_skip_count:
+        threshold = float('-inf')
+    else:
+        threshold = float(np.nextafter(candidate_scores[max_skip_count], np.inf))
+
+    def skip_rate(fluency):
+        skipped = sum(1 for score, oov_count in fluency if score >= threshold and oov_count <= max_oov)
+        return skipped / max(len(fluency), 1)
+
+    old_threshold, old_max_oov = detector.fast_path_threshold, detector.fast_path_max_oov
+    old_cache = detector.detect_cache
+    detector.detect_cache = None
+    try:
+        detector.enable_fast_path(False)
+        t1 = time.time()
+        full_hit_count = _detect_error_positions(detector, error_sentences, right_details)
+        for sentence in right_sentences:
+            detector.detect(sentence)
+        t2 = time.time()
+        detector.enable_fast_path(True, threshold=threshold, max_oov=max_oov)
+        fast_hit_count = _detect_error_positions(detector, error_sentences, right_details)
+        for sentence in right_sentences:
+            detector.detect(sentence)
+        t3 = time.time()
+    finally:
+        detector.fast_path_threshold, detector.fast_path_max_oov = old_threshold, old_max_oov
+        detector.detect_cache = old_cache
+    count = len(error_sentences) + len(right_sentences)
+    result = {
+        'threshold': threshold,
+        'max_oov': max_oov,
+        'error_skip_rate': skip_rate(error_fluency),
+        'right_skip_rate': skip_rate(right_fluency),
+        'full_detect_hit': full_hit_count,
+        'fast_detect_hit': fast_hit_count,
+        'full_sents_per_sec': count / max(t2 - t1, 1e-9),
+        'fast_sents_per_sec': count / max(t3 - t2, 1e-9),
+    }
+    if verbose:
+        print('fast path calibration:', result)
+    return result
+
+
 if __name__ == "__main__":
     lst = ['少先队员因（（应））该为老人让坐（（座））。',
            '王老师心（（性））格温和，态度和爱（（蔼）），教学有方，得到了许多人的好平（（评））。',
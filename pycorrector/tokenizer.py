@@ -3,10 +3,21 @@
 @author:XuMing（xuming624@qq.com)
 @description: 配置切词器
 """
+import copy
+import hashlib
 import logging
+import marshal
 import os
+import tempfile
+import threading
+
 import jieba
-from jieba import posseg
+from jieba import finalseg, posseg
+
+from pycorrector.utils.bundle import file_signature
+from pycorrector.utils.io_utils import get_logger
+
+logger = get_logger(__file__)
 
 
 def segment(sentence, cut_type='word', pos=False):
@@ -40,23 +51,122 @@ def segment(sentence, cut_type='word', pos=False):
 
 
 class Tokenizer(object):
-    def __init__(self, dict_path='', custom_word_freq_dict=None, custom_confusion_dict=None):
-        self.model = jieba
-        self.model.default_logger.setLevel(logging.ERROR)
+    def __init__(self, dict_path='', custom_word_freq_dict=None, custom_confusion_dict=None, cache_dir=''):
+        """
+        每个实例使用独立的jieba.Tokenizer，不同词典的实例互不影响
+        合并自定义词典和混淆集后的前缀词典缓存到文件，缓存键为基础词典及自定义词条的哈希
+        :param dict_path: 基础切词词典，不存在时用jieba默认词典
+        :param custom_word_freq_dict: dict, {word: freq}
+        :param custom_confusion_dict: dict, {variant: origin}
+        :param cache_dir: 前缀词典缓存目录，默认为系统临时目录
+        """
+        jieba.default_logger.setLevel(logging.ERROR)
         # 初始化大词典
-        if os.path.exists(dict_path):
-            self.model.set_dictionary(dict_path)
-        # 加载用户自定义词典
-        if custom_word_freq_dict:
+        self.model = jieba.Tokenizer(dict_path) if os.path.exists(dict_path) else jieba.Tokenizer()
+        custom_word_freq_dict = custom_word_freq_dict or {}
+        custom_confusion_dict = custom_confusion_dict or {}
+        cache_file = self._cache_file(cache_dir, custom_word_freq_dict, custom_confusion_dict)
+        if self._load_cache(cache_file):
+            # 词频为0的词需强制切分，与add_word一致
             for w, f in custom_word_freq_dict.items():
-                self.model.add_word(w, freq=f)
+                if not int(f):
+                    finalseg.add_force_split(w)
+            return
+        # 加载用户自定义词典
+        for w, f in custom_word_freq_dict.items():
+            self.model.add_word(w, freq=f)
 
         # 加载混淆集词典
-        if custom_confusion_dict:
-            for k, word in custom_confusion_dict.items():
-                # 添加到分词器的自定义词典中
-                self.model.add_word(k)
-                self.model.add_word(word)
+        for k, word in custom_confusion_dict.items():
+            # 添加到分词器的自定义词典中
+            self.model.add_word(k)
+            self.model.add_word(word)
+        self._save_cache(cache_file)
+
+    def _cache_file(self, cache_dir, custom_word_freq_dict, custom_confusion_dict):
+        """
+        合并后前缀词典的缓存文件路径，基础词典或自定义词条变化则缓存键变化
+        :return:
+        """
+        dict_path = self.model.dictionary or os.path.join(os.path.dirname(jieba.__file__), jieba.DEFAULT_DICT_NAME)
+        key = hashlib.md5()
+        key.update(repr((dict_path, file_signature(dict_path))).encode('utf-8'))
+        key.update(repr(list(custom_word_freq_dict.items())).encode('utf-8'))
+        key.update(repr(list(custom_confusion_dict.items())).encode('utf-8'))
+        return os.path.join(cache_dir or tempfile.gettempdir(), 'pycorrector_jieba.%s.cache' % key.hexdigest())
+
+    def _load_cache(self, cache_file):
+        if not os.path.isfile(cache_file):
+            return False
+        try:
+            with open(cache_file, 'rb') as f:
+                self.model.FREQ, self.model.total = marshal.loads(f.read())
+        except Exception as e:
+            logger.warn('load tokenizer cache error, path: %s, %s' % (cache_file, e))
+            return False
+        self.model.initialized = True
+        logger.debug('Loaded tokenizer cache: %s' % cache_file)
+        return True
+
+    def _save_cache(self, cache_file):
+        tmp_path = '%s.%d.tmp' % (cache_file, os.getpid())
+        try:
+            cache_dir = os.path.dirname(cache_file)
+            if cache_dir and not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            with open(tmp_path, 'wb') as f:
+                marshal.dump((self.model.FREQ, self.model.total), f)
+            os.replace(tmp_path, cache_file)
+        except OSError as e:
+            logger.warn('save tokenizer cache error, path: %s, %s' % (cache_file, e))
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def initialize(self):
+        """
+        立即构建切词前缀词典，避免首次切词时才加载（如fork子进程前）
+        :return:
+        """
+        self.model.initialize()
+
+    def add_word(self, word, freq=None):
+        """
+        增量加入切词词典
+        :param word:
+        :param freq: 词频，None时由切词器计算一个保证能切出该词的词频
+        :return:
+        """
+        self.model.check_initialized()
+        old_freq = self.model.FREQ.get(word, 0)
+        self.model.add_word(word, freq=freq)
+        # jieba的add_word不减去该词原有的词频，反复增删同一个词时total会虚增
+        self.model.total -= old_freq
+
+    def del_word(self, word):
+        """
+        从切词词典删除，只把词频置0，不像jieba的del_word那样把词加入进程全局的强制切分表
+        :param word:
+        :return:
+        """
+        self.model.check_initialized()
+        old_freq = self.model.FREQ.get(word)
+        if old_freq:
+            self.model.FREQ[word] = 0
+            self.model.total -= old_freq
+
+    def copy(self):
+        """
+        复制切词器，前缀词典为独立的副本，修改副本不影响原切词器
+        :return: Tokenizer
+        """
+        self.model.check_initialized()
+        model = copy.copy(self.model)
+        model.lock = threading.RLock()
+        model.FREQ = dict(self.model.FREQ)
+        model.user_word_tag_tab = dict(self.model.user_word_tag_tab)
+        tokenizer = copy.copy(self)
+        tokenizer.model = model
+        return tokenizer
 
     def tokenize(self, sentence):
         """
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+@author:XuMing（xuming624@qq.com)
+@description: Aho-Corasick多模式匹配自动机，一次线性扫描找出文本中所有模式串的出现位置
+"""
+from array import array
+
+# 转移表的键为 state * CHAR_SPACE + ord(char)，用单个int代替(state, char)元组以节省内存
+CHAR_SPACE = 0x110000
+
+
+class AhoCorasick(object):
+    def __init__(self, words=()):
+        """
+        编译模式串集合
+        :param words: iterable, 模式串
+        """
+        # 转移表 {state * CHAR_SPACE + ord(char): next_state}
+        self.goto = {}
+        # 失配指针
+        self.fail = array('i', [0])
+        # 以该状态结尾的模式串长度，0表示非终止状态
+        self.out = array('i', [0])
+        # 沿失配指针可到达的下一个终止状态
+        self.dict_link = array('i', [0])
+        self.size = 0
+        depth = array('i', [0])
+        parent = array('i', [0])
+        chars = ['']
+        for word in words:
+            if not word:
+                continue
+            state = 0
+            for char in word:
+                key = state * CHAR_SPACE + ord(char)
+                nxt = self.goto.get(key)
+                if nxt is None:
+                    nxt = len(self.fail)
+                    self.goto[key] = nxt
+                    self.fail.append(0)
+                    self.out.append(0)
+                    self.dict_link.append(0)
+                    depth.append(depth[state] + 1)
+                    parent.append(state)
+                    chars.append(char)
+                state = nxt
+            if not self.out[state]:
+                self.size += 1
+            self.out[state] = len(word)
+        # 按深度（BFS序）计算失配指针
+        for state in sorted(range(1, len(self.fail)), key=depth.__getitem__):
+            p = parent[state]
+            if p == 0:
+                continue
+            code = ord(chars[state])
+            f = self.fail[p]
+            while True:
+                nxt = self.goto.get(f * CHAR_SPACE + code)
+                if nxt is not None:
+                    self.fail[state] = nxt
+                    break
+                if f == 0:
+                    break
+                f = self.fail[f]
+            f = self.fail[state]
+            self.dict_link[state] = f if self.out[f] else self.dict_link[f]
+
+    def __len__(self):
+        return self.size
+
+    def iter(self, text):
+        """
+        扫描文本，取所有模式串的出现位置（含重叠的）
+        :param text:
+        :return: generator of (begin_idx, end_idx)
+        """
+        goto = self.goto
+        fail = self.fail
+        out = self.out
+        dict_link = self.dict_link
+        state = 0
+        for i, char in enumerate(text):
+            code = ord(char)
+            while True:
+                nxt = goto.get(state * CHAR_SPACE + code)
+                if nxt is not None:
+                    state = nxt
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            node = state if out[state] else dict_link[state]
+            while node:
+                yield i + 1 - out[node], i + 1
+                node = dict_link[node]
+
+    def find_all(self, text):
+        """
+        取所有匹配，按起始位置升序、同起点长串在前排序
+        :param text:
+        :return: list of (word, begin_idx, end_idx)
+        """
+        spans = sorted(self.iter(text), key=lambda k: (k[0], -k[1]))
+        return [(text[begin_idx:end_idx], begin_idx, end_idx) for begin_idx, end_idx in spans]
+
+
+if __name__ == '__main__':
+    ac = AhoCorasick(['he', 'she', 'his', 'hers'])
+    print(ac.find_all('ushers'))
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+@author:XuMing（xuming624@qq.com)
+@description: 单次纠错的资源预算，限定墙钟时间、疑似错误数、每个疑似错误的候选数和语言模型打分次数，
+预算耗尽时纠错返回已得到的最好结果并标记为降级
+"""
+import time
+
+
+class CorrectionBudget(object):
+    def __init__(self, timeout=None, max_suspects=None, max_candidates=None, max_lm_queries=None):
+        """
+        各项为None时不限
+        :param timeout: 墙钟时间上限，秒，从调用correct开始计时
+        :param max_suspects: 最多纠正的疑似错误数，困惑集中指定的词不计入
+        :param max_candidates: 每个疑似错误最多取的候选词数，按词频取前若干个
+        :param max_lm_queries: 语言模型打分的候选句数上限
+        """
+        self.timeout = timeout
+        self.max_suspects = max_suspects
+        self.max_candidates = max_candidates
+        self.max_lm_queries = max_lm_queries
+
+    def start(self):
+        """
+        开始一次纠错的计时和计数，同一预算可用于多次调用
+        :return: BudgetTracker
+        """
+        return BudgetTracker(self)
+
+
+class BudgetTracker(object):
+    def __init__(self, budget):
+        """
+        :param budget: CorrectionBudget
+        """
+        self.budget = budget
+        self.deadline = time.monotonic() + budget.timeout if budget.timeout is not None else None
+        self.suspects = 0
+        self.lm_queries = 0
+        # 是否因预算耗尽丢弃了疑似错误或候选词
+        self.degraded = False
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def check_expired(self):
+        """
+        是否已超时，超时时标记降级，用于单个疑似错误内耗时的步骤（生成候选词、打分）之前
+        :return: bool
+        """
+        if self.expired():
+            self.degraded = True
+            return True
+        return False
+
+    def lm_queries_left(self):
+        if self.budget.max_lm_queries is None:
+            return float('inf')
+        return self.budget.max_lm_queries - self.lm_queries
+
+    def allow_suspect(self, min_lm_queries=2):
+        """
+        是否还能纠正下一个疑似错误，不能时标记降级
+        :param min_lm_queries: 纠正一个疑似错误至少需要的打分次数（原词和一个候选词）
+        :return: bool
+        """
+        max_suspects = self.budget.max_suspects
+        if self.expired() or (max_suspects is not None and self.suspects >= max_suspects) or \
+                self.lm_queries_left() < min_lm_queries:
+            self.degraded = True
+            return False
+        self.suspects += 1
+        return True
+
+    def limit_candidates(self, candidates):
+        """
+        按max_candidates截断候选词，候选词已按词频降序排列
+        :param candidates: list
+        :return: list
+        """
+        max_candidates = self.budget.max_candidates
+        if max_candidates is not None and len(candidates) > max_candidates:
+            self.degraded = True
+            return candidates[:max_candidates]
+        return candidates
+
+    def take_lm_queries(self, count):
+        """
+        申请count次语言模型打分，剩余次数不足时只给剩余的次数并标记降级
+        :param count:
+        :return: int, 实际可用的次数
+        """
+        granted = min(count, self.lm_queries_left())
+        if granted < count:
+            self.degraded = True
+        self.lm_queries += granted
+        return int(granted)
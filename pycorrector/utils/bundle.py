@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+@author:XuMing（xuming624@qq.com)
+@description: 资源包，把解析好的词典等资源编译为一个二进制文件，按源文件的大小和修改时间失效
+"""
+import os
+import pickle
+
+from pycorrector.utils.io_utils import get_logger
+
+logger = get_logger(__file__)
+# 资源包格式版本，解析逻辑或存储格式变化时递增
+BUNDLE_VERSION = 1
+_bundles = {}
+
+
+def file_signature(path):
+    """
+    源文件签名，文件不存在时为None
+    :param path:
+    :return: (size, mtime_ns)
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ResourceBundle(object):
+    def __init__(self, path):
+        self.path = path
+        # {(name, source_path, ...): (source_signatures, pickled_data)}
+        self.sections = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                bundle = pickle.load(f)
+        except Exception as e:
+            logger.warn('load resource bundle error, path: %s, %s' % (self.path, e))
+            return
+        if bundle.get('version') != BUNDLE_VERSION:
+            logger.debug('resource bundle version changed, rebuild: %s' % self.path)
+            return
+        self.sections = bundle.get('sections', {})
+        self.prune()
+
+    def prune(self):
+        """
+        删除源文件已不存在或已变化的资源，避免资源包随临时加载的词典文件不断增大
+        :return: int, 删除的资源数
+        """
+        stale = [key for key, (signature, _) in self.sections.items()
+                 if any(s is None for s in signature)
+                 or signature != tuple(file_signature(path) for path in key[1:])]
+        for key in stale:
+            del self.sections[key]
+        if stale:
+            self.dirty = True
+            logger.debug('Pruned stale resource bundle sections: %d' % len(stale))
+        return len(stale)
+
+    def get(self, name, source_paths, builder):
+        """
+        取资源，源文件未变化时直接反序列化，否则调用builder重新解析并记入资源包
+        每次返回新对象，调用方可以自由修改
+        :param name: 资源名
+        :param source_paths: tuple, 资源的源文件
+        :param builder: 无参函数，解析源文件得到资源
+        :return:
+        """
+        key = (name,) + tuple(source_paths)
+        signature = tuple(file_signature(path) for path in source_paths)
+        section = self.sections.get(key)
+        if section is not None and section[0] == signature:
+            return pickle.loads(section[1])
+        data = builder()
+        self.sections[key] = (signature, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        self.dirty = True
+        return data
+
+    def save(self):
+        """
+        有新资源或删除了过期资源时写回资源包，先写临时文件再替换，多进程同时写入也不会损坏
+        :return:
+        """
+        self.prune()
+        if not self.dirty:
+            return
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        try:
+            bundle_dir = os.path.dirname(self.path)
+            if bundle_dir and not os.path.exists(bundle_dir):
+                os.makedirs(bundle_dir)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': BUNDLE_VERSION, 'sections': self.sections}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+            logger.debug('Saved resource bundle: %s, sections: %d' % (self.path, len(self.sections)))
+        except OSError as e:
+            logger.warn('save resource bundle error, path: %s, %s' % (self.path, e))
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def get_resource_bundle(path):
+    """
+    同一路径的资源包在进程内共享
+    :param path:
+    :return: ResourceBundle
+    """
+    if path not in _bundles:
+        _bundles[path] = ResourceBundle(path)
+    return _bundles[path]
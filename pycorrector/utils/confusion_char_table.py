@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+@author:XuMing（xuming624@qq.com)
+@description: 混淆字表，预先合并同音字和形似字，按字频降序存放在一个元组里，取候选字为切片
+"""
+
+
+class ConfusionCharTable(object):
+    def __init__(self, same_pinyin, same_stroke, freq_func=None, top_k=0):
+        """
+        :param same_pinyin: dict, {char: set(char)}
+        :param same_stroke: dict, {char: set(char)}
+        :param freq_func: 取字频的函数，候选字按字频降序、同频按码位升序排列
+        :param top_k: 每个字最多保留的候选字数，0为不截断
+        """
+        self.top_k = top_k
+        candidates = []
+        # {char: (begin, end)}
+        self.spans = {}
+        for char in set(same_pinyin) | set(same_stroke):
+            confusion = same_pinyin.get(char, set()) | same_stroke.get(char, set())
+            if freq_func is not None:
+                confusion = sorted(confusion, key=lambda k: (-freq_func(k), k))
+            else:
+                confusion = sorted(confusion)
+            if top_k:
+                confusion = confusion[:top_k]
+            self.spans[char] = (len(candidates), len(candidates) + len(confusion))
+            candidates.extend(confusion)
+        self.candidates = tuple(candidates)
+
+    def __len__(self):
+        return len(self.spans)
+
+    def get(self, char):
+        """
+        取混淆字
+        :param char:
+        :return: tuple
+        """
+        span = self.spans.get(char)
+        if span is None:
+            return ()
+        return self.candidates[span[0]:span[1]]
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+@author:XuMing（xuming624@qq.com)
+@description: 支持增量更新的混淆集，基础混淆集及其自动机 + 少量增删的差量及其小自动机，
+差量超过阈值时才合并重建，每次更新的耗时与差量大小相关，与混淆集大小无关
+"""
+from collections.abc import Mapping
+
+from pycorrector.utils.ahocorasick import AhoCorasick
+
+# 差量不超过该值时不合并
+MIN_MERGE_SIZE = 1024
+# 差量超过基础混淆集的该比例时合并重建
+MERGE_RATIO = 0.1
+
+
+class ConfusionDict(Mapping):
+    """
+    只读的混淆集 {variant: origin}，update返回新对象，原对象不变，读取方可以不加锁继续使用
+    """
+
+    def __init__(self, confusion=None):
+        """
+        :param confusion: dict, {variant: origin}
+        """
+        self.base = dict(confusion or {})
+        self.base_automaton = AhoCorasick(self.base)
+        # 差量：新增或修改的词 {variant: origin}，删除的基础混淆词
+        self.added = {}
+        self.removed = frozenset()
+        # 只在差量中的混淆词的自动机
+        self.added_automaton = AhoCorasick()
+        self.size = len(self.base)
+
+    def update(self, add=None, remove=None):
+        """
+        增删混淆词，返回新的混淆集，基础混淆集和自动机与原对象共享
+        :param add: dict, {variant: origin}, 新增或修改的混淆词
+        :param remove: iterable, 删除的混淆词
+        :return: ConfusionDict
+        """
+        added = dict(self.added)
+        removed = set(self.removed)
+        for variant in remove or ():
+            added.pop(variant, None)
+            if variant in self.base:
+                removed.add(variant)
+        for variant, origin in (add or {}).items():
+            added[variant] = origin
+            removed.discard(variant)
+        if len(added) + len(removed) > max(MIN_MERGE_SIZE, len(self.base) * MERGE_RATIO):
+            merged = {variant: origin for variant, origin in self.base.items()
+                      if variant not in removed and variant not in added}
+            merged.update(added)
+            return ConfusionDict(merged)
+        result = ConfusionDict.__new__(ConfusionDict)
+        result.base = self.base
+        result.base_automaton = self.base_automaton
+        result.added = added
+        result.removed = frozenset(removed)
+        # 修改基础混淆词的本体词不影响匹配，只有新词需进入差量自动机
+        new_words = [variant for variant in added if variant not in self.base]
+        result.added_automaton = AhoCorasick(new_words)
+        result.size = len(self.base) - len(removed) + len(new_words)
+        return result
+
+    def __contains__(self, variant):
+        if variant in self.added:
+            return True
+        return variant not in self.removed and variant in self.base
+
+    def __getitem__(self, variant):
+        if variant in self.added:
+            return self.added[variant]
+        if variant in self.removed:
+            raise KeyError(variant)
+        return self.base[variant]
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for variant in self.base:
+            if variant not in self.removed and variant not in self.added:
+                yield variant
+        for variant in self.added:
+            yield variant
+
+    def find_all(self, text):
+        """
+        取文本中所有混淆词，按起始位置升序、同起点长串在前排序
+        :param text:
+        :return: list of (variant, begin_idx, end_idx)
+        """
+        matches = self.base_automaton.find_all(text)
+        if self.removed:
+            matches = [match for match in matches if match[0] not in self.removed]
+        if len(self.added_automaton):
+            matches = sorted(matches + self.added_automaton.find_all(text), key=lambda k: (k[1], -k[2]))
+        return matches
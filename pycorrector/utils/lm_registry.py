@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+@author:XuMing（xuming624@qq.com)
+@description: 语言模型注册表，同一进程内相同路径和加载方式的kenlm模型只加载一次，各检测器共享
+kenlm二进制模型（.klm）按mmap映射，多进程加载同一文件时共享系统页缓存
+"""
+import os
+import threading
+
+import kenlm
+
+from pycorrector.utils.io_utils import get_logger
+
+logger = get_logger(__file__)
+
+# kenlm加载方式
+# lazy: 按需mmap，启动最快，首次查询时才读盘
+# populate_or_read: mmap并预读入内存（kenlm默认）
+# populate_or_lazy: mmap并尽量预读入内存，失败时按需读取
+# read: 读入进程私有内存，不与其他进程共享
+# parallel_read: 多线程读入进程私有内存
+LOAD_METHODS = {
+    'lazy': kenlm.LoadMethod.LAZY,
+    'populate_or_read': kenlm.LoadMethod.POPULATE_OR_READ,
+    'populate_or_lazy': kenlm.LoadMethod.POPULATE_OR_LAZY,
+    'read': kenlm.LoadMethod.READ,
+    'parallel_read': kenlm.LoadMethod.PARALLEL_READ,
+}
+DEFAULT_LOAD_METHOD = 'populate_or_read'
+
+_lock = threading.Lock()
+# {(abs_path, load_method): [model, ref_count]}
+_models = {}
+
+
+def _model_key(path, load_method):
+    if load_method not in LOAD_METHODS:
+        raise ValueError('unknown language model load method: %s, should be one of %s' % (
+            load_method, ', '.join(LOAD_METHODS)))
+    return os.path.realpath(path), load_method
+
+
+def get_language_model(path, load_method=DEFAULT_LOAD_METHOD):
+    """
+    取共享的语言模型，引用计数加1，不再使用时调用release_language_model
+    :param path: 语言模型文件路径
+    :param load_method: 加载方式，见LOAD_METHODS
+    :return: kenlm.Model
+    """
+    key = _model_key(path, load_method)
+    with _lock:
+        item = _models.get(key)
+        if item is not None:
+            item[1] += 1
+            return item[0]
+    # 加载耗时较长，不持有全局锁，其他模型可同时加载
+    config = kenlm.Config()
+    config.load_method = LOAD_METHODS[load_method]
+    model = kenlm.Model(path, config)
+    with _lock:
+        item = _models.get(key)
+        if item is None:
+            item = _models[key] = [model, 0]
+            logger.debug('Registered language model: %s, load method: %s' % (key[0], load_method))
+        item[1] += 1
+        return item[0]
+
+
+def release_language_model(path, load_method=DEFAULT_LOAD_METHOD):
+    """
+    引用计数减1，归零时从注册表移除，模型内存在最后一个引用释放后回收
+    :param path:
+    :param load_method:
+    :return:
+    """
+    key = _model_key(path, load_method)
+    with _lock:
+        item = _models.get(key)
+        if item is None:
+            return
+        item[1] -= 1
+        if item[1] <= 0:
+            del _models[key]
+            logger.debug('Released language model: %s' % key[0])
+
+
+def _smaps_memory():
+    """
+    按映射文件汇总本进程的常驻内存
+    :return: dict, {path: {'rss': bytes, 'pss': bytes}}
+    """
+    memory = {}
+    current = None
+    with open('/proc/self/smaps', 'r') as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            if not fields[0].endswith(':'):
+                # 映射区段首行: address perms offset dev inode [pathname]
+                path = ' '.join(fields[5:])
+                current = memory.setdefault(path, {'rss': 0, 'pss': 0}) if path else None
+            elif current is not None and fields[0] in ('Rss:', 'Pss:'):
+                current[fields[0][:-1].lower()] += int(fields[1]) * 1024
+    return memory
+
+
+def language_model_memory():
+    """
+    已注册语言模型的文件大小和本进程中的常驻内存
+    二进制模型按mmap映射，rss为已读入内存的页，pss为按共享进程数均摊后的大小；
+    arpa文件解析到进程私有的匿名内存，无法按文件统计，rss和pss为None
+    :return: dict, {path: {'load_method', 'refs', 'file_size', 'rss', 'pss'}}
+    """
+    try:
+        mapped = _smaps_memory()
+    except OSError:
+        mapped = {}
+    with _lock:
+        items = list(_models.items())
+    info = {}
+    for (path, load_method), (model, refs) in items:
+        memory = mapped.get(path, {})
+        info[path] = {'load_method': load_method, 'refs': refs, 'file_size': os.path.getsize(path),
+                      'rss': memory.get('rss'), 'pss': memory.get('pss')}
+    return info
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+@author:XuMing（xuming624@qq.com)
+@description: 有界LRU缓存，统计命中、未命中和淘汰次数
+"""
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    def __init__(self, maxsize=10000):
+        """
+        :param maxsize: 最大缓存条数，超出时淘汰最久未使用的条目
+        """
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        """
+        取缓存，命中时将该条目移到最近使用的位置
+        :param key:
+        :param default: 未命中时的返回值
+        :return:
+        """
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.data.clear()
+
+    def info(self):
+        """
+        缓存统计信息
+        :return: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self.data), 'maxsize': self.maxsize}
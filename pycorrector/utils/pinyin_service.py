@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+@author:XuMing（xuming624@qq.com)
+@description: 拼音服务，CJK统一汉字区逐字预先计算各风格的拼音，多字词的结果放入LRU缓存，
+结果与pypinyin的pinyin/lazy_pinyin一致，进程内共享
+"""
+import threading
+
+import pypinyin
+from pypinyin import Style, lazy_pinyin, pinyin
+
+from pycorrector.utils.bundle import get_resource_bundle
+from pycorrector.utils.lru_cache import LRUCache
+
+# CJK统一汉字区的范围是0x4E00-0x9FA5
+CJK_BEGIN = 0x4e00
+CJK_END = 0x9fa6
+STYLES = {
+    'normal': Style.NORMAL,
+    'tone2': Style.TONE2,
+    'tone3': Style.TONE3,
+}
+_service = None
+_service_lock = threading.Lock()
+
+
+def build_char_table():
+    """
+    逐字计算CJK统一汉字区各风格的拼音
+    :return: dict, {style_name: list, 下标为 ord(char) - CJK_BEGIN}
+    """
+    return {name: [pinyin(chr(i), style=style)[0][0] for i in range(CJK_BEGIN, CJK_END)]
+            for name, style in STYLES.items()}
+
+
+class PinyinService(object):
+    def __init__(self, char_table=None, cache_size=100000):
+        """
+        :param char_table: build_char_table()的结果，为空则现场计算
+        :param cache_size: 多字词拼音的LRU缓存条数
+        """
+        self.char_table = char_table if char_table is not None else build_char_table()
+        self.cache = LRUCache(cache_size)
+        self.lock = threading.Lock()
+        # {style_name: {pinyin: [char]}}，按码位升序
+        self.homophones = {}
+
+    def char_pinyin(self, char, style='normal'):
+        """
+        取单字拼音，非CJK统一汉字返回None
+        :param char:
+        :param style: STYLES中的风格名
+        :return: str
+        """
+        code = ord(char) - CJK_BEGIN
+        if 0 <= code < CJK_END - CJK_BEGIN:
+            return self.char_table[style][code]
+        return None
+
+    def lazy_pinyin(self, word, style='normal'):
+        """
+        与pypinyin.lazy_pinyin(word, style=style)一致
+        :param word:
+        :param style: STYLES中的风格名
+        :return: list
+        """
+        if len(word) == 1:
+            char_pinyin = self.char_pinyin(word, style)
+            if char_pinyin is not None:
+                return [char_pinyin]
+        key = (word, style)
+        with self.lock:
+            result = self.cache.get(key)
+        if result is None:
+            # 多字词按词组匹配读音，直接调用pypinyin
+            result = tuple(lazy_pinyin(word, style=STYLES[style]))
+            with self.lock:
+                self.cache.put(key, result)
+        return list(result)
+
+    def pinyin(self, word, style='normal'):
+        """
+        与pypinyin.pinyin(word, style=style)一致（不取多音字）
+        :param word:
+        :param style: STYLES中的风格名
+        :return: list of list
+        """
+        return [[item] for item in self.lazy_pinyin(word, style)]
+
+    def homophones_by_pinyin(self, input_pinyin, style='normal'):
+        """
+        取该拼音的全部CJK统一汉字
+        :param input_pinyin:
+        :param style: STYLES中的风格名
+        :return: list, 按码位升序
+        """
+        homophones = self.homophones.get(style)
+        if homophones is None:
+            homophones = {}
+            for i, char_pinyin in enumerate(self.char_table[style]):
+                homophones.setdefault(char_pinyin, []).append(chr(CJK_BEGIN + i))
+            self.homophones[style] = homophones
+        return list(homophones.get(input_pinyin, []))
+
+    def cache_info(self):
+        return self.cache.info()
+
+
+def load_char_table(resource_bundle_path=''):
+    """
+    取逐字拼音表，开启资源包时从资源包读取，pypinyin的字典文件变化时重建
+    :param resource_bundle_path: 资源包路径，为空则现场计算
+    :return: build_char_table()的结果
+    """
+    if not resource_bundle_path:
+        return build_char_table()
+    bundle = get_resource_bundle(resource_bundle_path)
+    char_table = bundle.get('pinyin_char_table', (pypinyin.pinyin_dict.__file__,), build_char_table)
+    bundle.save()
+    return char_table
+
+
+def get_pinyin_service(resource_bundle_path=''):
+    """
+    取进程内共享的拼音服务，逐字拼音表从资源包读取，pypinyin的字典文件变化时重建
+    :param resource_bundle_path: 资源包路径，为空则现场计算，只在首次调用时生效
+    :return: PinyinService
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = PinyinService(load_char_table(resource_bundle_path))
+    return _service
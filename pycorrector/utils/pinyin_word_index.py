@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+@author:XuMing（xuming624@qq.com)
+@description: 拼音倒排索引，整词拼音 => 同音词集合，取同音的编辑距离为1的候选词不必枚举全部替换字
+"""
+from pycorrector.utils.pinyin_service import get_pinyin_service
+
+
+def pinyin_key(word):
+    """
+    整词拼音，作为索引键
+    :param word:
+    :return: tuple
+    """
+    return tuple(get_pinyin_service().lazy_pinyin(word))
+
+
+class PinyinWordIndex(object):
+    def __init__(self, words=()):
+        """
+        :param words: iterable, 词典中的词
+        """
+        # {pinyin_key: set(word)}
+        self.index = {}
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return sum(len(words) for words in self.index.values())
+
+    def add(self, word):
+        self.index.setdefault(pinyin_key(word), set()).add(word)
+
+    def remove(self, word):
+        key = pinyin_key(word)
+        words = self.index.get(key)
+        if words is None:
+            return
+        words.discard(word)
+        if not words:
+            del self.index[key]
+
+    def prepare_update(self, words, word_freq):
+        """
+        不修改索引，算好这些词增删后各拼音键的新词集合，耗时的拼音计算在此完成
+        :param words: iterable, 变化的词
+        :param word_freq: 修改后的词频词典，词在其中则加入索引，否则移出
+        :return: (dict, {pinyin_key: set(word)}; list, 不再有词的pinyin_key)
+        """
+        updated = {}
+        for word in words:
+            key = pinyin_key(word)
+            if key not in updated:
+                updated[key] = set(self.index.get(key, ()))
+            if word in word_freq:
+                updated[key].add(word)
+            else:
+                updated[key].discard(word)
+        removed_keys = [key for key, key_words in updated.items() if not key_words]
+        for key in removed_keys:
+            del updated[key]
+        return updated, removed_keys
+
+    def apply_update(self, update):
+        """
+        应用prepare_update的结果，只替换各拼音键的词集合
+        :param update: prepare_update的返回值
+        :return:
+        """
+        updated, removed_keys = update
+        self.index.update(updated)
+        for key in removed_keys:
+            self.index.pop(key, None)
+
+    def same_pinyin_words(self, word, char_set):
+        """
+        取与word拼音相同、且为word交换相邻两字或替换一个字（替换字属于char_set）得到的词，
+        与 known(edit_distance_word(word, char_set)) 中拼音相同的部分一致
+        :param word:
+        :param char_set: 可替换的字集合
+        :return: set
+        """
+        result = set()
+        if not word:
+            return result
+        word_len = len(word)
+        for candidate in self.index.get(pinyin_key(word), ()):
+            if len(candidate) != word_len:
+                continue
+            diff = [i for i in range(word_len) if candidate[i] != word[i]]
+            if not diff:
+                # 替换为原字或交换相同的相邻字得到原词
+                if any(char in char_set for char in word) or \
+                        any(word[i] == word[i + 1] for i in range(word_len - 1)):
+                    result.add(candidate)
+            elif len(diff) == 1:
+                if candidate[diff[0]] in char_set:
+                    result.add(candidate)
+            elif len(diff) == 2:
+                i, j = diff
+                if j == i + 1 and candidate[i] == word[j] and candidate[j] == word[i]:
+                    result.add(candidate)
+        return result
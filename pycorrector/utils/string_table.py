@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+@author:XuMing（xuming624@qq.com)
+@description: 只读的紧凑词频表，词按utf-8字节序排序存放，文件通过mmap映射，多进程共享同一份物理内存
+文件格式（小端）：
+    header:  magic(4s) version(I) size(I) slot_count(I)
+    offsets: uint32 * (size + 1)，第i个词为words[offsets[i]:offsets[i + 1]]
+    freqs:   int64 * size
+    slots:   uint32 * slot_count，以crc32为哈希的开放寻址表，存 词序号 + 1，0为空
+    words:   排序后的utf-8字节串拼接
+"""
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import MutableMapping
+
+import numpy as np
+
+MAGIC = b'PCST'
+VERSION = 1
+HEADER = struct.Struct('<4sIII')
+
+
+class StringTable(object):
+    def __init__(self, path):
+        """
+        以只读方式mmap映射词频表文件
+        :param path:
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size, slot_count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('invalid string table file: %s' % path)
+        # memoryview按下标取值直接得到int，比numpy标量快
+        view = memoryview(self.mm)
+        pos = HEADER.size
+        self.offsets = view[pos:pos + 4 * (self.size + 1)].cast('I')
+        pos += 4 * (self.size + 1)
+        self.freqs = view[pos:pos + 8 * self.size].cast('q')
+        pos += 8 * self.size
+        self.slots = view[pos:pos + 4 * slot_count].cast('I')
+        pos += 4 * slot_count
+        self.words = view[pos:]
+        self.mask = slot_count - 1
+
+    @staticmethod
+    def build(word_freq, path):
+        """
+        由词频dict生成词频表文件，先写临时文件再替换
+        :param word_freq: dict, {word: freq}
+        :param path:
+        :return:
+        """
+        words = sorted(word.encode('utf-8') for word in word_freq)
+        size = len(words)
+        slot_count = 1
+        while slot_count < size * 2:
+            slot_count <<= 1
+        mask = slot_count - 1
+        offsets = np.zeros(size + 1, dtype='<u4')
+        freqs = np.zeros(size, dtype='<i8')
+        slots = np.zeros(slot_count, dtype='<u4')
+        pos = 0
+        for i, word in enumerate(words):
+            offsets[i] = pos
+            pos += len(word)
+            freqs[i] = word_freq[word.decode('utf-8')]
+            slot = zlib.crc32(word) & mask
+            while slots[slot]:
+                slot = (slot + 1) & mask
+            slots[slot] = i + 1
+        offsets[size] = pos
+        table_dir = os.path.dirname(path)
+        if table_dir and not os.path.exists(table_dir):
+            os.makedirs(table_dir)
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, size, slot_count))
+            f.write(offsets.tobytes())
+            f.write(freqs.tobytes())
+            f.write(slots.tobytes())
+            f.write(b''.join(words))
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return self.size
+
+    def _word_bytes(self, i):
+        return self.words[self.offsets[i]:self.offsets[i + 1]]
+
+    def word(self, i):
+        """
+        取第i个词
+        :param i:
+        :return: str
+        """
+        return bytes(self._word_bytes(i)).decode('utf-8')
+
+    def index(self, word):
+        """
+        取词的序号
+        :param word:
+        :return: int, 不存在时为-1
+        """
+        key = word.encode('utf-8')
+        slot = zlib.crc32(key) & self.mask
+        while True:
+            i = self.slots[slot]
+            if not i:
+                return -1
+            if self._word_bytes(i - 1) == key:
+                return i - 1
+            slot = (slot + 1) & self.mask
+
+    def __contains__(self, word):
+        return self.index(word) >= 0
+
+    def get(self, word, default=None):
+        i = self.index(word)
+        return self.freqs[i] if i >= 0 else default
+
+    def __getitem__(self, word):
+        i = self.index(word)
+        if i < 0:
+            raise KeyError(word)
+        return self.freqs[i]
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self.word(i)
+
+    def to_dict(self):
+        """
+        读出全部词及词频，查询频繁时比逐次在表中探查快
+        :return: dict, {word: freq}
+        """
+        words = bytes(self.words)
+        offsets = self.offsets.tolist()
+        return {words[offsets[i]:offsets[i + 1]].decode('utf-8'): freq
+                for i, freq in enumerate(self.freqs.tolist())}
+
+
+class CompactWordFreq(MutableMapping):
+    """
+    词频dict的替代：只读词频表 + 进程内的少量修改
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.overlay = {}
+        self.removed = set()
+
+    def __contains__(self, word):
+        if word in self.overlay:
+            return True
+        return word not in self.removed and word in self.table
+
+    def get(self, word, default=None):
+        if word in self.overlay:
+            return self.overlay[word]
+        if word in self.removed:
+            return default
+        return self.table.get(word, default)
+
+    def __getitem__(self, word):
+        freq = self.get(word)
+        if freq is None:
+            raise KeyError(word)
+        return freq
+
+    def __setitem__(self, word, freq):
+        self.removed.discard(word)
+        if word not in self.overlay and self.table.get(word) == freq:
+            # 与词频表一致，不必复制到进程内
+            return
+        self.overlay[word] = freq
+
+    def __delitem__(self, word):
+        if word not in self:
+            raise KeyError(word)
+        self.overlay.pop(word, None)
+        if word in self.table:
+            self.removed.add(word)
+
+    def copy(self):
+        """
+        复制进程内的修改，词频表共享
+        :return: CompactWordFreq
+        """
+        word_freq = CompactWordFreq(self.table)
+        word_freq.overlay = dict(self.overlay)
+        word_freq.removed = set(self.removed)
+        return word_freq
+
+    def __len__(self):
+        added = sum(1 for word in self.overlay if word not in self.table)
+        return len(self.table) + added - len(self.removed)
+
+    def __iter__(self):
+        for word in self.table:
+            if word not in self.removed and word not in self.overlay:
+                yield word
+        for word in self.overlay:
+            yield word
+
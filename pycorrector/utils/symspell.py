@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+@author:XuMing（xuming624@qq.com)
+@description: 删除变体索引（symmetric delete），词典中每个词删除至多max_distance个字符得到的字符串 => 原词，
+查询词与候选词删除若干字符后相同才可能在编辑距离内，查询时只需枚举查询词的删除变体，不必枚举全部编辑
+"""
+
+
+def delete_variants(word, max_distance):
+    """
+    删除至多max_distance个字符得到的全部字符串，含原词
+    :param word:
+    :param max_distance:
+    :return: set
+    """
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+class DeleteIndex(object):
+    def __init__(self, words=(), max_distance=2):
+        """
+        :param words: iterable, 词典中的词
+        :param max_distance: 最大删除字符数
+        """
+        self.max_distance = max_distance
+        index = {}
+        for word in words:
+            for variant in delete_variants(word, max_distance):
+                index.setdefault(variant, []).append(word)
+        # 只对应一个词的变体直接存词，节省内存
+        self.index = {variant: words[0] if len(words) == 1 else tuple(words) for variant, words in index.items()}
+
+    def __len__(self):
+        return len(self.index)
+
+    def lookup(self, word, distance):
+        """
+        取与word各删除至多distance个字符后相同的词，经k次增删改或相邻交换可互相转换的词都在其中，需调用方再精确校验
+        :param word:
+        :param distance: 不大于max_distance
+        :return: set
+        """
+        if distance > self.max_distance:
+            raise ValueError('distance %d exceeds max distance of the index: %d' % (distance, self.max_distance))
+        result = set()
+        for variant in delete_variants(word, distance):
+            words = self.index.get(variant)
+            if words is None:
+                continue
+            if isinstance(words, str):
+                result.add(words)
+            else:
+                result.update(words)
+        return result
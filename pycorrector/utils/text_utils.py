@@ -3,10 +3,7 @@
 # Brief: 汉字处理的工具:判断unicode是否是汉字，数字，英文，或者其他字符。以及全角符号转半角符号。
 import re
 
-import pypinyin
-from pypinyin import pinyin
-
-from pycorrector.utils.langconv import Converter
+from pycorrector.utils.pinyin_service import get_pinyin_service
 
 
 def is_chinese(uchar):
@@ -81,14 +78,62 @@ def Q2B(uchar):
     return chr(inside_code)
 
 
+class TranslateTable(dict):
+    """
+    str.translate的转换表，字符首次出现时按func逐字转换并缓存，之后只是一次字典查找
+    """
+
+    def __init__(self, func, codes=()):
+        """
+        :param func: 逐字转换函数
+        :param codes: 预先转换的字符码位
+        """
+        super(TranslateTable, self).__init__()
+        self.func = func
+        for code in codes:
+            self[code] = func(chr(code))
+
+    def __missing__(self, code):
+        value = self[code] = self.func(chr(code))
+        return value
+
+
+# 预先转换ASCII、拉丁字母、CJK标点和全角字符
+_table_codes = list(range(0x100)) + list(range(0x3000, 0x3040)) + list(range(0xff00, 0xfff0))
+q2b_table = TranslateTable(Q2B, _table_codes)
+uniform_table = TranslateTable(lambda uchar: Q2B(uchar).lower(), _table_codes)
+# str.lower对希腊大写字母Σ按其是否在词尾转为ς或σ，与上下文有关，不能逐字转换
+FINAL_SIGMA_CHAR = '\u03a3'
+
+
 def stringQ2B(ustring):
     """把字符串全角转半角"""
-    return "".join([Q2B(uchar) for uchar in ustring])
+    return ustring.translate(q2b_table)
+
+
+def stringQ2B_batch(ustrings):
+    """
+    批量全角转半角
+    :param ustrings: list
+    :return: list
+    """
+    return [ustring.translate(q2b_table) for ustring in ustrings]
 
 
 def uniform(ustring):
     """格式化字符串，完成全角转半角，大写转小写的工作"""
-    return stringQ2B(ustring).lower()
+    if FINAL_SIGMA_CHAR in ustring:
+        return stringQ2B(ustring).lower()
+    return ustring.translate(uniform_table)
+
+
+def uniform_batch(ustrings):
+    """
+    批量格式化字符串，与逐个调用uniform一致
+    :param ustrings: list
+    :return: list
+    """
+    return [uniform(ustring) for ustring in ustrings]
 
 
 def remove_punctuation(strs):
@@ -100,14 +145,28 @@ def remove_punctuation(strs):
     return re.sub("[\s+\.\!\/<>“”,$%^*(+\"\']+|[+——！，。？、~@#￥%……&*（）]+", "", strs.strip())
 
 
+# 分句标点，切分后标点保留在前一个短句末尾
+re_clause = re.compile(r"[^，。！？；…,!?;\n]+[，。！？；…,!?;\n]*|[，。！？；…,!?;\n]+", re.U)
+
+
+def split_2_short_text(text):
+    """
+    长文本按分句标点切分为短句
+    :param text: 长文本
+    :return: list, [(短句, 短句在原文中的起始位置)]，短句拼接后与原文一致
+    """
+    return [(m.group(), m.start()) for m in re_clause.finditer(text)]
+
+
 def traditional2simplified(sentence):
     """
     将sentence中的繁体字转为简体字
     :param sentence: 待转换的句子
     :return: 将句子中繁体字转换为简体字之后的句子
     """
-    sentence = Converter('zh-hans').convert(sentence)
-    return sentence
+    # zh_converter依赖本模块的TranslateTable，在此导入
+    from pycorrector.utils.zh_converter import get_converter
+    return get_converter('zh-hans').convert(sentence)
 
 
 def simplified2traditional(sentence):
@@ -116,8 +175,8 @@ def simplified2traditional(sentence):
     :param sentence: 待转换的句子
     :return: 将句子中简体字转换为繁体字之后的句子
     """
-    sentence = Converter('zh-hant').convert(sentence)
-    return sentence
+    from pycorrector.utils.zh_converter import get_converter
+    return get_converter('zh-hant').convert(sentence)
 
 
 def get_homophones_by_char(input_char):
@@ -126,12 +185,9 @@ def get_homophones_by_char(input_char):
     :param input_char:
     :return:
     """
-    result = []
     # CJK统一汉字区的范围是0x4E00-0x9FA5,也就是我们经常提到的20902个汉字
-    for i in range(0x4e00, 0x9fa6):
-        if pinyin([chr(i)], style=pypinyin.NORMAL)[0][0] == pinyin(input_char, style=pypinyin.NORMAL)[0][0]:
-            result.append(chr(i))
-    return result
+    service = get_pinyin_service()
+    return service.homophones_by_pinyin(service.pinyin(input_char, 'normal')[0][0], 'normal')
 
 
 def get_homophones_by_pinyin(input_pinyin):
@@ -140,13 +196,9 @@ def get_homophones_by_pinyin(input_pinyin):
     :param input_pinyin:
     :return:
     """
-    result = []
     # CJK统一汉字区的范围是0x4E00-0x9FA5,也就是我们经常提到的20902个汉字
-    for i in range(0x4e00, 0x9fa6):
-        if pinyin([chr(i)], style=pypinyin.TONE2)[0][0] == input_pinyin:
-            # TONE2: 中zho1ng
-            result.append(chr(i))
-    return result
+    # TONE2: 中zho1ng
+    return get_pinyin_service().homophones_by_pinyin(input_pinyin, 'tone2')
 
 
 if __name__ == "__main__":
@@ -164,3 +216,4 @@ if __name__ == "__main__":
     print(is_chinese('喜'))
     print(is_chinese_string('喜,'))
     print(is_chinese_string('丽，'))
+    print(split_2_short_text('少先队员因该为老人让坐，我们要宝护它们。好吗?'))
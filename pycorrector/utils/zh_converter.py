@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+@author:XuMing（xuming624@qq.com)
+@description: 简繁转换，由zh_wiki的转换表编译一次，结果与langconv.Converter一致
+单字用str.translate批量转换；遇到多字词的首字时，按前缀树（存全部词及其前缀）并行展开各种切分，
+与langconv的状态机相同：各切分都走完一个词后取词数最少的，词数相同取先展开的
+"""
+import re
+import threading
+
+from pycorrector.utils.text_utils import TranslateTable
+from pycorrector.utils.zh_wiki import zh2Hans, zh2Hant
+
+MAPPINGS = {
+    'zh-hans': zh2Hans,
+    'zh-hant': zh2Hant,
+}
+_converters = {}
+_converters_lock = threading.Lock()
+
+
+class ZhConverter(object):
+    def __init__(self, mapping):
+        """
+        :param mapping: dict, {词: 转换后的词}
+        """
+        # 前缀树: {词或词的前缀: (是否为词, 是否有更长的词, 转换后的词)}
+        self.trie = {}
+        for key in mapping:
+            for i in range(1, len(key)):
+                is_key, _, to_word = self.trie.get(key[:i], (False, True, ''))
+                self.trie[key[:i]] = (is_key, True, to_word)
+            has_child = self.trie.get(key, (False, False, ''))[1]
+            self.trie[key] = (True, has_child, mapping[key] or key)
+        single_chars = {key: value[2] for key, value in self.trie.items() if len(key) == 1 and value[0]}
+        self.char_table = TranslateTable(lambda uchar: single_chars.get(uchar, uchar))
+        # 多字词的首字，其余字符逐字转换
+        head_chars = sorted(set(key[0] for key in mapping if len(key) > 1))
+        self.head_re = re.compile('[%s]' % ''.join(re.escape(c) for c in head_chars)) if head_chars else None
+
+    def convert(self, text):
+        """
+        转换文本
+        :param text:
+        :return: str
+        """
+        stream = ConvertStream(self)
+        return stream.feed(text) + stream.end()
+
+    def convert_batch(self, texts):
+        """
+        批量转换
+        :param texts: list
+        :return: list
+        """
+        return [self.convert(text) for text in texts]
+
+    def convert_stream(self, chunks):
+        """
+        流式转换，词可以跨越相邻的文本块，结果拼接后与整体转换一致
+        :param chunks: iterable, 文本块，如逐行读取的文件
+        :return: generator, 转换后的文本块
+        """
+        stream = ConvertStream(self)
+        for chunk in chunks:
+            result = stream.feed(chunk)
+            if result:
+                yield result
+        result = stream.end()
+        if result:
+            yield result
+
+
+class ConvertStream(object):
+    def __init__(self, converter):
+        """
+        :param converter: ZhConverter
+        """
+        self.converter = converter
+        # 展开中的切分: [已转换的文本, 词数, 未走完的词]，为None时各切分已合并
+        self.paths = None
+
+    def feed(self, text):
+        """
+        输入文本，返回已确定的转换结果，未走完的词留到下次输入
+        :param text:
+        :return: str
+        """
+        trie = self.converter.trie
+        head_re = self.converter.head_re
+        pieces = []
+        i = 0
+        text_len = len(text)
+        while i < text_len:
+            if self.paths is None:
+                match = head_re.search(text, i) if head_re else None
+                head_idx = match.start() if match else text_len
+                if head_idx > i:
+                    pieces.append(text[i:head_idx].translate(self.converter.char_table))
+                    i = head_idx
+                if i >= text_len:
+                    break
+                self.paths = [['', 0, '']]
+            char = text[i]
+            i += 1
+            paths = []
+            branches = []
+            for path in self.paths:
+                final, count, pool = path
+                key = pool + char
+                node = trie.get(key)
+                if node is None:
+                    if pool:
+                        # 未走完的词接不上，该切分失败
+                        continue
+                    path[0] = final + char
+                    path[1] = count + 1
+                else:
+                    is_key, has_child, to_word = node
+                    if has_child and (is_key or not pool):
+                        # 另展开一个切分等待更长的词，当前切分按单字或已走完的词转换
+                        branches.append([final, count, key])
+                        path[0] = final + (to_word if is_key else key)
+                        path[1] = count + 1
+                        path[2] = ''
+                    elif has_child:
+                        path[2] = key
+                    else:
+                        path[0] = final + to_word
+                        path[1] = count + 1
+                        path[2] = ''
+                paths.append(path)
+            paths.extend(branches)
+            self.paths = paths
+            if all(not path[2] for path in paths):
+                pieces.append(self._best())
+        return ''.join(pieces)
+
+    def _best(self):
+        # 词数最少的切分，词数相同取先展开的
+        best = min(self.paths, key=lambda path: path[1])[0]
+        self.paths = None
+        return best
+
+    def end(self):
+        """
+        输入结束，丢弃未走完的词，返回剩余的转换结果
+        :return: str
+        """
+        if self.paths is None:
+            return ''
+        self.paths = [path for path in self.paths if not path[2]]
+        return self._best()
+
+
+def get_converter(to_encoding):
+    """
+    取进程内共享的转换器
+    :param to_encoding: 'zh-hans' 转为简体，'zh-hant' 转为繁体
+    :return: ZhConverter
+    """
+    converter = _converters.get(to_encoding)
+    if converter is None:
+        with _converters_lock:
+            converter = _converters.get(to_encoding)
+            if converter is None:
+                converter = _converters[to_encoding] = ZhConverter(MAPPINGS[to_encoding])
+    return converter
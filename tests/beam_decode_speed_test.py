@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Author: XuMing <xuming624@qq.com>
+# Brief: 词格束搜索与逐个贪心纠错在sighan15和clp14上的速度和整句准确率对比
+import os
+import time
+
+from pycorrector import corrector
+from pycorrector.eval import get_sighan_right_sentence
+from pycorrector.utils.io_utils import load_pkl
+
+pwd_path = os.path.abspath(os.path.dirname(__file__))
+data_paths = {
+    'sighan15': os.path.join(pwd_path, '../pycorrector/data/cn/sighan15_A2.pkl'),
+    'clp14': os.path.join(pwd_path, '../pycorrector/data/cn/clp14_C1.pkl'),
+}
+
+
+def eval_decode(data, beam_size):
+    corrector.enable_beam_decode(beam_size > 0, beam_size)
+    right_count = 0
+    t1 = time.time()
+    for error_sentence, right_detail in data:
+        pred_sentence, pred_detail = corrector.correct(error_sentence)
+        if pred_sentence == get_sighan_right_sentence(error_sentence, right_detail):
+            right_count += 1
+    spend = time.time() - t1
+    return right_count / len(data), spend * 1000 / len(data)
+
+
+if __name__ == '__main__':
+    corrector.enable_candidate_cache(False)
+    for name, path in data_paths.items():
+        data = load_pkl(path)
+        for beam_size in [0, 1, 4, 8, 16]:
+            acc, ms = eval_decode(data, beam_size)
+            print('[%s] %s acc: %.4f, %.2f ms/sent' % (
+                name, 'beam_size=%d' % beam_size if beam_size else 'greedy', acc, ms))
+    corrector.enable_beam_decode(False)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Author: XuMing <xuming624@qq.com>
+# Brief: 混淆集规模从1k增长到1M时detect的耗时
+
+import os
+import random
+import tempfile
+import time
+
+from pycorrector import Corrector
+from pycorrector.config import *
+from pycorrector.utils.ahocorasick import AhoCorasick
+
+error_sentences = [
+    '少先队员因该为老人让坐',
+    '服装店里的衣服各试各样',
+    '一只小鱼船浮在平净的河面上',
+    '我的家乡是有明的渔米之乡',
+    '有了宠物出租地方另一方面还可以题高人类对动物的了解，因为那些专业人氏可以指导我们对于动物的习惯。',
+    '还有广告业是只要桌子前面坐者工作未必产生出来好的成果。',
+]
+
+
+def random_word(min_len=2, max_len=4):
+    return ''.join(chr(random.randint(0x4e00, 0x9fa5)) for _ in range(random.randint(min_len, max_len)))
+
+
+def write_confusion_file(path, size):
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(size):
+            f.write('%s\t%s\n' % (random_word(), random_word()))
+
+
+def find_confusion(sentence, confusion):
+    """逐个混淆词调用find的原实现，作为对照"""
+    result = []
+    for confuse in confusion:
+        idx = sentence.find(confuse)
+        if idx > -1:
+            result.append((confuse, idx, idx + len(confuse)))
+    return result
+
+
+if __name__ == '__main__':
+    random.seed(0)
+    num = 100
+    for size in [1000, 10000, 100000, 1000000]:
+        corrector = Corrector(common_char_path=common_char_path,
+                              same_pinyin_path=same_pinyin_path,
+                              same_stroke_path=same_stroke_path,
+                              language_model_path=language_model_path,
+                              word_freq_path=word_freq_path,
+                              custom_word_freq_path=custom_word_freq_path,
+                              custom_confusion_path=custom_confusion_path,
+                              person_name_path=person_name_path,
+                              place_name_path=place_name_path,
+                              stopwords_path=stopwords_path)
+        # 只保留混淆集检测，排除切词和语言模型的耗时
+        corrector.enable_word_error(False)
+        corrector.enable_char_error(False)
+        path = os.path.join(tempfile.gettempdir(), 'confusion_%d.txt' % size)
+        write_confusion_file(path, size)
+        corrector.check_detector_initialized()
+        t1 = time.time()
+        corrector.set_custom_confusion_dict(path)
+        t2 = time.time()
+        for _ in range(num):
+            for line in error_sentences:
+                corrector.detect(line)
+        t3 = time.time()
+        for _ in range(num):
+            for line in error_sentences:
+                find_confusion(line, corrector.custom_confusion)
+        t4 = time.time()
+        count = num * len(error_sentences)
+        print('[confusion size: %d] build: %.3f s, detect: %.3f ms/sent, find loop: %.3f ms/sent' % (
+            len(corrector.custom_confusion), t2 - t1, (t3 - t2) * 1000 / count, (t4 - t3) * 1000 / count))
+        os.remove(path)
+    print(AhoCorasick(['因该', '让坐']).find_all(error_sentences[0]))
@@ -4,7 +4,8 @@
 
 import unittest
 
-from pycorrector import correct, get_same_stroke
+import pycorrector
+from pycorrector import correct, correct_document, get_same_stroke
 from pycorrector.utils.math_utils import get_sub_array
 
 
@@ -56,6 +57,38 @@ class BasicTestSuite(unittest.TestCase):
             correct_sent = correct(line)
             print("original sentence:{} => correct sentence:{}".format(line, correct_sent))
 
+    def test_empty_document(self):
+        self.assertEqual(correct_document(''), ('', []))
+
+    def test_confusion_char_set(self):
+        # 同音同形字按词频降序、同频按字排序，与未缓存时的集合一致
+        c = pycorrector.corrector
+        for ch in '少先队员因该为老人让坐长':
+            confusion = c._confusion_char_set(ch)
+            self.assertEqual(set(confusion), c.get_same_pinyin(ch) | c.get_same_stroke(ch))
+            self.assertEqual(list(confusion), sorted(confusion, key=lambda k: (-c.word_frequency(k), k)))
+
+    def test_candidate_cache(self):
+        # 候选缓存命中、关闭缓存及自定义词更新后的候选一致
+        c = pycorrector.corrector
+        c.check_corrector_initialized()
+        c.check_detector_initialized()
+        words = ['因该', '坐', '老人', '让坐', '少先队', '因该为']
+        cached = [c.generate_items(w) for w in words]
+        try:
+            c.enable_candidate_cache(False)
+            self.assertEqual(cached, [c.generate_items(w) for w in words])
+            c.enable_candidate_cache(True)
+            self.assertEqual(cached, [c.generate_items(w) for w in words])
+            c.add_custom_words({'阴该为': 99999})
+            cached = [c.generate_items(w) for w in words]
+            self.assertIn('阴该为', cached[-1])
+            c.enable_candidate_cache(False)
+            self.assertEqual(cached, [c.generate_items(w) for w in words])
+        finally:
+            c.enable_candidate_cache(True)
+            c.remove_custom_words(['阴该为'])
+
     @staticmethod
     def homophones():
         nums = [0, 1, 2, 5, 7, 8]
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 # Author: XuMing <xuming624@qq.com>
 # Brief:
+import random
+import time
+
 import pycorrector
+from pycorrector.detector import ErrorSpanIndex
 from pycorrector.tokenizer import segment
 
 c = pycorrector.get_same_pinyin('长')
@@ -27,3 +31,72 @@ print(pycorrector.detect(sent))
 
 corrected_sent, detail = pycorrector.correct('少先队员因该为老人让坐')
 print(corrected_sent, detail)
+
+# 单遍扫描的字窗口得分与逐窗口ngram_score一致
+window_scores = pycorrector.corrector.char_window_scores(sent)
+for n in [2, 3, 4]:
+    for i in range(len(sent) - n + 1):
+        assert window_scores[i, n - 1] == pycorrector.ngram_score(list(sent[i:i + n]))
+print('char_window_scores ok')
+
+# 只对候选词附近的窗口重新打分，结果与整句困惑度完全一致
+for before_sent, after_sent, items in [('少先队员', '为老人让坐', ['因该', '应该', '因为', '应', '阴该该']),
+                                       ('', '为老人让坐', ['因该', '应']),
+                                       ('少先队员因该为老人', '', ['让坐', '让座', '让'])]:
+    assert pycorrector.corrector.ppl_scores_in_context(items, before_sent, after_sent) == \
+           [pycorrector.ppl_score(list(before_sent + item + after_sent)) for item in items]
+print('ppl_scores_in_context ok')
+
+# 疑似错误按区间去重，与逐个比较已有错误的原实现一致
+random.seed(0)
+for _ in range(500):
+    error_index = ErrorSpanIndex()
+    expected = []
+    for _ in range(8):
+        begin_idx = random.randint(0, len(sent) - 1)
+        end_idx = random.randint(begin_idx + 1, len(sent))
+        err = [sent[begin_idx:end_idx], begin_idx, end_idx, random.randint(1, 3)]
+        error_index.add(*err)
+        if err not in expected and not any(err[0] in e[0] and err[1] >= e[1] and err[2] <= e[2] for e in expected):
+            expected.append(err)
+    assert error_index.to_list() == sorted(expected, key=lambda k: k[1])
+print('ErrorSpanIndex ok')
+
+# 结果缓存
+pycorrector.enable_result_cache(maxsize=100)
+print(pycorrector.detect(sent), pycorrector.detect(sent))
+print(pycorrector.result_cache_info())
+pycorrector.enable_result_cache(False)
+
+# 增量更新混淆集和自定义词
+pycorrector.update_confusions(add={'老人让坐': '老人让座'})
+assert ['老人让坐', 7, 11, 1] in pycorrector.detect(sent)
+pycorrector.update_confusions(remove=['老人让坐'])
+pycorrector.add_custom_words({'因该为': 5})
+assert pycorrector.word_frequency('因该为') == 5
+pycorrector.remove_custom_words(['因该为'])
+assert pycorrector.word_frequency('因该为') == 0
+# 只删除自定义词，基础词典中的词不受影响
+base_word = next(w for w in pycorrector.corrector.word_freq if w not in pycorrector.corrector.custom_word_freq)
+base_freq = pycorrector.word_frequency(base_word)
+pycorrector.remove_custom_words([base_word])
+assert pycorrector.word_frequency(base_word) == base_freq
+print(pycorrector.detect(sent))
+
+# 共享语言模型的文件大小和常驻内存
+print(pycorrector.language_model_memory())
+
+# 单次纠错的资源预算，耗尽时返回已得到的结果并标记降级
+corrected_sent, detail, degraded = pycorrector.correct('少先队员因该为老人让坐',
+                                                       budget=pycorrector.CorrectionBudget(max_suspects=1))
+print(corrected_sent, detail, degraded)
+assert len(detail) <= 1
+
+# 单个疑似错误内生成候选词后已超时，不再打分，保留原词
+generate_items = pycorrector.corrector.generate_items
+pycorrector.corrector.generate_items = lambda word, fraction=1: time.sleep(0.2) or generate_items(word, fraction)
+corrected_sent, detail, degraded = pycorrector.correct('少先队员因该为老人让坐',
+                                                       budget=pycorrector.CorrectionBudget(timeout=0.1))
+del pycorrector.corrector.generate_items
+print(corrected_sent, detail, degraded)
+assert degraded and corrected_sent == '少先队员因该为老人让坐' and detail == []
@@ -23,6 +23,15 @@ def correction_t():
     return 'unit_test pass'
 
 
+def correct_text_t():
+    text = 'Speling is hard, corection of 2019 HTTP speling.'
+    corrected_text, detail = correct_text(text)
+    assert corrected_text == 'Spelling is hard, correction of 2019 HTTP spelling.'
+    assert detail[0] == ['Speling', 'Spelling', 0, 7]
+    assert correct_batch([text, 'word']) == [(corrected_text, detail), ('word', [])]
+    return 'correct_text pass'
+
+
 def spell_t(tests, verbose=False):
     """
     run correction(wrong) on all (right,wrong) pairs, and report result
@@ -56,5 +65,12 @@ def get_set(lines):
 
 if __name__ == '__main__':
     print(correction_t())
+    print(correct_text_t())
     spell_t(get_set(open('../pycorrector/data/en/spell-testset1.txt')),verbose=True)  # Dev set
     spell_t(get_set(open('../pycorrector/data/en/spell-testset2.txt')),verbose=True)  # final test set
+    # 删除变体索引生成候选词，结果与逐个枚举编辑一致
+    enable_symspell()
+    print(correction_t())
+    spell_t(get_set(open('../pycorrector/data/en/spell-testset1.txt')))
+    spell_t(get_set(open('../pycorrector/data/en/spell-testset2.txt')))
+    enable_symspell(False)
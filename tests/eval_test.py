@@ -33,6 +33,12 @@ def sighan_data_test():
     # cn_spell rate:0.2
 
 
+def calibrate_fast_path_test():
+    for max_recall_loss in [0.01, 0.02, 0.05]:
+        result = calibrate_fast_path(sighan_path, max_recall_loss=max_recall_loss)
+        print('max_recall_loss:{}, result:{}'.format(max_recall_loss, result))
+
+
 def get_confusion_dict():
     confusions = []
     sighan_data = load_pkl(clp_path)
@@ -56,5 +62,6 @@ if __name__ == "__main__":
     # eval_bcmi_data_test()
     clp_data_test()
     sighan_data_test()
+    calibrate_fast_path_test()
     #get_confusion_、dict()
 
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Author: XuMing <xuming624@qq.com>
+# Brief: 启动耗时：python -X importtime 统计 import pycorrector 的耗时，与首次调用时初始化默认纠错器的耗时分开统计
+import subprocess
+import sys
+
+first_call_code = '''
+import time
+t1 = time.time()
+import pycorrector
+t2 = time.time()
+# 导入kenlm、numpy等依赖并创建默认纠错器
+pycorrector.corrector
+t3 = time.time()
+# 加载词典和语言模型
+pycorrector.correct('少先队员因该为老人让坐')
+t4 = time.time()
+print('import: %.3f s, create corrector: %.3f s, first correct: %.3f s' % (t2 - t1, t3 - t2, t4 - t3))
+'''
+
+
+def import_time(module='pycorrector', top_n=10):
+    """
+    解析 -X importtime 的输出，返回总耗时和累计耗时最多的模块
+    :param module:
+    :param top_n:
+    :return: 总耗时（微秒）, list of (cumulative_us, module)
+    """
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+                            stderr=subprocess.PIPE, universal_newlines=True).stderr
+    items = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # import time: self [us] | cumulative | imported package
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        items.append((int(cumulative_us), name.strip()))
+    total = max(cumulative for cumulative, name in items if name == module)
+    return total, sorted(items, reverse=True)[:top_n]
+
+
+if __name__ == '__main__':
+    total, top = import_time()
+    print('import pycorrector: %.1f ms' % (total / 1000))
+    for cumulative_us, name in top:
+        print('%10.1f ms  %s' % (cumulative_us / 1000, name))
+    subprocess.run([sys.executable, '-c', first_call_code])
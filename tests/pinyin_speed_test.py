@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Author: XuMing <xuming624@qq.com>
+# Brief: 拼音服务与直接调用pypinyin的每秒调用次数对比
+import time
+
+import pypinyin
+from pypinyin import lazy_pinyin, pinyin
+
+from pycorrector.utils.pinyin_service import get_pinyin_service
+
+chars = list('少先队员因该为老人让坐服装店里的衣服各试各样一只小鱼船浮在平净的河面上')
+words = ['少先队员', '因该', '老人', '让坐', '服装店', '衣服', '各试各样', '小鱼船', '平净', '河面']
+
+
+def calls_per_second(func, items, num=200):
+    t1 = time.time()
+    for _ in range(num):
+        for item in items:
+            func(item)
+    return num * len(items) / (time.time() - t1)
+
+
+if __name__ == '__main__':
+    service = get_pinyin_service()
+    cases = [
+        ('lazy_pinyin char', lambda c: lazy_pinyin(c), lambda c: service.lazy_pinyin(c), chars),
+        ('lazy_pinyin word', lambda w: lazy_pinyin(w), lambda w: service.lazy_pinyin(w), words),
+        ('pinyin tone3 word', lambda w: pinyin(w, style=pypinyin.TONE3), lambda w: service.pinyin(w, 'tone3'), words),
+    ]
+    for name, before, after, items in cases:
+        assert [before(i) for i in items] == [after(i) for i in items]
+        print('%s: pypinyin %.0f calls/s, service %.0f calls/s' % (
+            name, calls_per_second(before, items), calls_per_second(after, items)))
+    # 同音字：原实现逐字调用pypinyin
+    t1 = time.time()
+    old = [c for c in map(chr, range(0x4e00, 0x9fa6))
+           if pinyin([c], style=pypinyin.NORMAL)[0][0] == pinyin('中', style=pypinyin.NORMAL)[0][0]]
+    t2 = time.time()
+    new = service.homophones_by_pinyin(service.pinyin('中')[0][0])
+    t3 = time.time()
+    assert old == new
+    print('homophones_by_char: pypinyin %.3f s, service %.6f s' % (t2 - t1, t3 - t2))
@@ -3,7 +3,7 @@
 # Brief:
 
 import time
-from pycorrector import correct, detect
+from pycorrector import correct, detect, correct_batch, detect_batch
 
 error_sentences = [
     '汽车新式在这条路上',
@@ -41,5 +41,11 @@ for i in range(3):
         correct_sent = correct(line)
 t3 = time.time()
 print('[correct] spend time: %f s' % (t3 - t2))
+
+results = correct_batch(error_sentences * 3, n_jobs=4)
+t4 = time.time()
+print('[correct_batch] spend time: %f s' % (t4 - t3))
+assert correct_batch([]) == []
+assert detect_batch([]) == []
 # spend time: 1.497331 s
 # spend time: 10.858631 s
@@ -5,7 +5,12 @@ from pypinyin import lazy_pinyin
 
 from pycorrector.utils.text_utils import traditional2simplified, simplified2traditional
 from pycorrector.utils.text_utils import get_homophones_by_char, get_homophones_by_pinyin
+from pycorrector.utils.text_utils import Q2B, uniform, uniform_batch, stringQ2B, stringQ2B_batch
 from pycorrector.tokenizer import segment
+from pycorrector.utils.langconv import Converter
+from pycorrector.utils.math_utils import edit_distance_word
+from pycorrector.utils.pinyin_word_index import PinyinWordIndex
+from pycorrector.utils.zh_converter import get_converter
 
 traditional_sentence = '憂郁的臺灣烏龜'
 simplified_sentence = traditional2simplified(traditional_sentence)
@@ -15,8 +20,25 @@ simplified_sentence = '忧郁的台湾乌龟'
 traditional_sentence = simplified2traditional(simplified_sentence)
 print(traditional_sentence)
 
+# 编译后的简繁转换与langconv一致，流式转换的词可以跨越文本块
+for encoding, sentence in [('zh-hans', '憂郁的臺灣烏龜'), ('zh-hant', '忧郁的台湾乌龟，打印机和帮助文件')]:
+    converter = get_converter(encoding)
+    assert converter.convert(sentence) == Converter(encoding).convert(sentence)
+    assert ''.join(converter.convert_stream([sentence[:5], sentence[5:11], sentence[11:]])) == converter.convert(sentence)
+    print(converter.convert_batch([sentence, sentence[::-1]]))
+
 print(lazy_pinyin('中心'))  # 不带音调
 
+# 拼音倒排索引取同音词，与逐个比较编辑距离为1的候选词的拼音一致
+words = ['中心', '忠心', '钟心', '衷心', '中新', '心中', '重心', '中', '钟', '因该', '应该', '应改', '该应']
+char_set = set('中忠钟衷心新重因应该改')
+index = PinyinWordIndex(words)
+for word in ['中心', '心中', '因该', '应该', '中', '重心', '中新']:
+    known = set(w for w in edit_distance_word(word, char_set) if w in words)
+    expected = set(w for w in known if lazy_pinyin(w) == lazy_pinyin(word))
+    assert index.same_pinyin_words(word, char_set) == expected, word
+print(index.same_pinyin_words('中心', char_set))
+
 print(segment('小姑娘蹦蹦跳跳的去了她外公家'))
 
 
@@ -25,3 +47,9 @@ print('get_homophones_by_char:', pron)
 
 pron = get_homophones_by_pinyin('zha1ng')
 print('get_homophones_by_pinyin:', pron)
+
+# 转换表与逐字全角转半角、转小写一致
+for sentence in ['ＡＢＣ　我们ａｂｃ，Ｈello！', 'ΑΣ ΟΔΟΣ', '']:
+    assert stringQ2B(sentence) == ''.join(Q2B(c) for c in sentence)
+    assert uniform(sentence) == ''.join(Q2B(c) for c in sentence).lower()
+print(uniform_batch(['ＡＢＣ　我们ａｂｃ，Ｈello！', 'ΑΣ ΟΔΟΣ']), stringQ2B_batch(['ＡＢＣ　我们']))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Author: XuMing <xuming624@qq.com>
+# Brief: 对比dict词频与mmap词频表在多进程下每个worker的内存占用(RSS/PSS)
+
+import multiprocessing
+import os
+import sys
+import tempfile
+
+from pycorrector import Corrector
+from pycorrector.config import *
+
+corrector = None
+
+
+def memory_usage():
+    """
+    取当前进程的RSS和PSS(按共享进程数分摊的常驻内存)，单位MB
+    :return: (rss, pss)
+    """
+    usage = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                usage[parts[0][:-1]] = int(parts[1]) / 1024
+    return usage.get('Rss', 0), usage.get('Pss', 0)
+
+
+def lookup_all(_):
+    # 访问全部词频，模拟worker的查词负载
+    for word in corrector.word_freq:
+        corrector.word_frequency(word)
+    return memory_usage()
+
+
+def run(word_freq_table_dir, n_jobs=4):
+    global corrector
+    corrector = Corrector(common_char_path=common_char_path,
+                          same_pinyin_path=same_pinyin_path,
+                          same_stroke_path=same_stroke_path,
+                          language_model_path=language_model_path,
+                          word_freq_path=word_freq_path,
+                          custom_word_freq_path=custom_word_freq_path,
+                          custom_confusion_path=custom_confusion_path,
+                          person_name_path=person_name_path,
+                          place_name_path=place_name_path,
+                          stopwords_path=stopwords_path,
+                          word_freq_table_dir=word_freq_table_dir)
+    corrector.prepare_fork()
+    with multiprocessing.get_context('fork').Pool(n_jobs) as pool:
+        usages = pool.map(lookup_all, range(n_jobs), chunksize=1)
+    name = 'mmap table' if word_freq_table_dir else 'dict'
+    for i, (rss, pss) in enumerate(usages):
+        print('[%s] worker %d, rss: %.1f MB, pss: %.1f MB' % (name, i, rss, pss))
+
+
+if __name__ == '__main__':
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print('need linux /proc/self/smaps_rollup')
+        sys.exit()
+    # 每种方式在独立的子进程中测试，避免互相影响
+    for table_dir in ['', os.path.join(tempfile.gettempdir(), 'pycorrector_table')]:
+        p = multiprocessing.get_context('fork').Process(target=run, args=(table_dir,))
+        p.start()
+        p.join()